@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import threading
+import time
+import pandas as pd
+import load_data
+import static_export
+
+# Materialized aggregates for the USA tab.
+# The import functions below turn the full event-level dataset into small tables (one row per Games or per sport/event).
+# "python aggregates.py" computes all of them once and stores them as versioned artifacts,
+# so that plot_figures only has to read a small file instead of recomputing them from the full dataset.
+# The artifacts are written to and read from AGGREGATES_DIR (default Data/aggregates).
+
+AGGREGATES_DIR = os.environ.get("AGGREGATES_DIR") or "Data/aggregates"
+
+# The first and last year of the Olympic dataset, for the year sliders when there is no manifest
+# (the layout is built when the app is imported, before the dataset is loaded in the background)
+DEFAULT_YEARS = [1896, 2016]
+
+# Increase when the output of any of the aggregate functions changes, so that old artifacts are not used
+AGGREGATES_VERSION = 2
+
+AGGREGATES = dict(medals_count=load_data.import_medals_count,
+                medals_per_sport_and_event=load_data.import_medals_per_sport_and_event,
+                top_ten_sports_and_events_all_medal_types=load_data.import_top_ten_sports_and_events_all_medal_types,
+                participants_data=load_data.import_participants_data)
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def artifacts_dir(dataset_version: str = None, aggregates_dir: str = AGGREGATES_DIR) -> str:
+    """Returns: the directory with the artifacts for a dataset version (default the current dataset)"""
+    if dataset_version is None:
+        dataset_version = load_data.dataset_version()
+
+    return os.path.join(aggregates_dir, f"v{AGGREGATES_VERSION}-{dataset_version[:16]}")
+
+
+def build_aggregates(aggregates_dir: str = AGGREGATES_DIR) -> str:
+    """
+    Computes every aggregate from the full dataset and writes them as artifacts, together with a manifest.
+
+    Parameters
+    ----------
+    aggregates_dir : str
+        The directory to store the artifacts in (default AGGREGATES_DIR, the app only reads the artifacts from there).
+
+    Returns
+    -------
+    directory : str
+        The directory the artifacts were written to.
+    """
+
+    dataset_version = load_data.dataset_version()
+    directory = artifacts_dir(dataset_version, aggregates_dir)
+    os.makedirs(directory, exist_ok=True)
+
+    artifacts = {}
+    for name, function in AGGREGATES.items():
+        start = time.perf_counter()
+        pd.to_pickle(function(), os.path.join(directory, f"{name}.pkl"))
+        artifacts[name] = dict(file=f"{name}.pkl", seconds=round(time.perf_counter() - start, 3))
+
+    #The manifest is written last, a directory without a manifest is not used
+    #It also lists the sports of the sports tab and the years for the year sliders, so the layout can be built without loading the dataset
+    manifest = dict(aggregates_version=AGGREGATES_VERSION, dataset_sha256=dataset_version, created=time.strftime("%Y-%m-%dT%H:%M:%S"), 
+                    artifacts=artifacts, sports=[str(sport) for sport in load_data.get_sport_statistics().sports()], years=_dataset_years())
+    with open(os.path.join(directory, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+    return directory
+
+
+def load_aggregate(name: str):
+    """
+    Returns an aggregate (the same value as the matching import function in load_data).
+    The artifact for the current dataset version is read if it exists, otherwise the aggregate is computed.
+    Either way the result is kept in memory, so it is only read or computed once per process and dataset version.
+    The returned value is shared and must not be modified.
+
+    Parameters
+    ----------
+    name : str
+        One of: medals_count, medals_per_sport_and_event, top_ten_sports_and_events_all_medal_types and participants_data.
+    """
+
+    dataset_version = load_data.dataset_version()
+    key = (name, dataset_version)
+
+    if key not in _loaded:
+        with _loaded_lock:
+            if key not in _loaded:
+                _loaded[key] = _read_or_compute(name, dataset_version)
+
+    return _loaded[key]
+
+
+def clear_loaded_aggregates() -> None:
+    """Forgets the aggregates kept in memory."""
+    with _loaded_lock:
+        _loaded.clear()
+
+
+def sports() -> list:
+    """Returns: the sorted list of sports for the sports tab, from the manifest if there is one (otherwise the sports SportStatistics is made for)"""
+
+    if static_export.static_mode():
+        return static_export.manifest()["sports"]
+
+    manifest = _read_manifest()
+    if manifest is not None and "sports" in manifest:
+        return manifest["sports"]
+
+    return load_data.SportStatistics.sport_names()
+
+
+def years() -> list:
+    """Returns: [first year, last year] of the dataset for the year sliders, from the manifest if there is one (otherwise DEFAULT_YEARS)"""
+
+    if static_export.static_mode():
+        return static_export.manifest()["years"]
+
+    manifest = _read_manifest()
+    if manifest is not None and "years" in manifest:
+        return manifest["years"]
+
+    return list(DEFAULT_YEARS)
+
+
+def _dataset_years() -> list:
+    """Returns: [first year, last year] of the dataset"""
+    years = load_data.import_world_data(["Year"])["Year"]
+    return [int(years.min()), int(years.max())]
+
+
+def _read_manifest():
+    """Returns: the manifest of the artifacts for the current dataset (None if there is none)"""
+
+    # without any artifacts there is no need for the dataset version (which builds the columnar cache if it is missing)
+    if not os.path.isdir(AGGREGATES_DIR):
+        return None
+
+    manifest_path = os.path.join(artifacts_dir(), "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as file:
+        return json.load(file)
+
+
+def _read_or_compute(name: str, dataset_version: str):
+    """Reads the artifact of an aggregate, or computes the aggregate if there is no artifact."""
+
+    directory = artifacts_dir(dataset_version)
+    if os.path.exists(os.path.join(directory, "manifest.json")):
+        return pd.read_pickle(os.path.join(directory, f"{name}.pkl"))
+
+    return AGGREGATES[name]()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Computes the aggregates used by the USA tab and stores them as artifacts.")
+    parser.add_argument("--output-dir", default=AGGREGATES_DIR, help="default AGGREGATES_DIR, the app only reads the artifacts from there")
+    args = parser.parse_args()
+
+    print(f"Aggregates written to {build_aggregates(args.output_dir)}")
@@ -1,8 +1,249 @@
-import pandas as pd
+import argparse
+import functools
 import hashlib as hl
+import hmac
+import os
+import secrets
+import shutil
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# Replaces the athlete names in the dataset with their sha256 hex digest.
+# The csv file is read, anonymized and written in chunks, so the memory use does not depend on the size of the file.
+# Every distinct name is only hashed once (names are remembered in a bounded cache) and the hashing is spread over a process pool.
+#
+# With --incremental the names are hashed with a keyed HMAC-SHA256 (so they can not be found by hashing a list of known names),
+# the digests are kept in a persistent store and only the rows of Games that have not been anonymized before are processed
+# and appended to the output, so a data refresh only costs the new rows.
+# Usage: python anonymize_os_data.py [--input Data/athlete_events.csv] [--output Data/athlete_events_anonymized.csv] [--incremental]
+
+INPUT_PATH = "Data/athlete_events.csv"
+OUTPUT_PATH = "Data/athlete_events_anonymized.csv"
+STORE_PATH = "Data/name_hashes.sqlite"
+KEY_PATH = "Data/anonymize.key"
+
+# the types pandas finds when reading the whole file, so every chunk is written the same way
+DTYPES = dict(ID="int64", Age="float64", Height="float64", Weight="float64", Year="int64")
+
+
+def hash_name(name: str, key: bytes = None) -> str:
+    """Returns: the sha256 hex digest of a name (HMAC-SHA256 if a key is given)"""
+    if key is None:
+        return hl.sha256(name.encode()).hexdigest()
+
+    return hmac.new(key, name.encode(), hl.sha256).hexdigest()
+
+
+def hash_names(names: list, key: bytes = None) -> list:
+    """Returns: the digests of a list of names (run in the worker processes)"""
+    return [hash_name(name, key) for name in names]
+
+
+def load_key(key_path: str = KEY_PATH) -> bytes:
+    """Returns: the HMAC key from the environment variable ANONYMIZE_KEY (hex) or the key file, which is created if it is missing"""
+
+    if os.environ.get("ANONYMIZE_KEY"):
+        return bytes.fromhex(os.environ["ANONYMIZE_KEY"])
+
+    if not os.path.exists(key_path):
+        # only the owner may read the key
+        descriptor = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, "w") as file:
+            file.write(secrets.token_hex(32))
+
+    with open(key_path) as file:
+        return bytes.fromhex(file.read().strip())
+
+
+class NameHashes:
+    """Cache of the digests of the latest max_names distinct names (least recently used names are forgotten)."""
+
+    def __init__(self, max_names: int) -> None:
+        self.max_names = max_names
+        self._hashes = OrderedDict()
+
+    def missing(self, names) -> list:
+        """Returns: the names that are not in the cache"""
+        return [name for name in names if name not in self._hashes]
+
+    def update(self, names: list, hashes: list) -> None:
+        self._hashes.update(zip(names, hashes))
+        while len(self._hashes) > self.max_names:
+            self._hashes.popitem(last=False)
+
+    def mapping(self, names) -> dict:
+        """Returns: dict name -> digest for the names (which must be in the cache)"""
+        mapping = {}
+        for name in names:
+            mapping[name] = self._hashes[name]
+            self._hashes.move_to_end(name)
+
+        return mapping
+
+
+class NameStore:
+    """Persistent store (sqlite) of name -> digest and of the Games that have been anonymized."""
+
+    # sqlite allows at most 999 parameters in a query
+    _BATCH = 900
+
+    def __init__(self, path: str = STORE_PATH) -> None:
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS names (name TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS games (games TEXT PRIMARY KEY)")
+
+    def lookup(self, names: list) -> dict:
+        """Returns: dict name -> digest for the names that are in the store"""
+        found = {}
+        for index in range(0, len(names), self._BATCH):
+            batch = names[index:index + self._BATCH]
+            query = f"SELECT name, digest FROM names WHERE name IN ({','.join('?' * len(batch))})"
+            found.update(self._connection.execute(query, batch).fetchall())
+
+        return found
+
+    def add(self, names: list, digests: list) -> None:
+        self._connection.executemany("INSERT OR REPLACE INTO names VALUES (?, ?)", zip(names, digests))
+
+    def processed_games(self) -> set:
+        return {games for (games,) in self._connection.execute("SELECT games FROM games")}
+
+    def add_games(self, games) -> None:
+        self._connection.executemany("INSERT OR IGNORE INTO games VALUES (?)", [(item,) for item in games])
+
+    def commit(self) -> None:
+        self._connection.commit()
+
+    def rollback(self) -> None:
+        self._connection.rollback()
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def anonymize(input_path: str = INPUT_PATH, output_path: str = OUTPUT_PATH, chunk_rows: int = 100_000,
+                workers: int = None, max_cached_names: int = 1_000_000, report=print,
+                incremental: bool = False, store_path: str = STORE_PATH, key: bytes = None) -> dict:
+    """
+    Writes a copy of the dataset where every name is replaced by its digest.
+
+    Parameters
+    ----------
+    input_path : str
+        The dataset with names (default Data/athlete_events.csv).
+    output_path : str
+        The anonymized dataset (default Data/athlete_events_anonymized.csv).
+    chunk_rows : int
+        Number of rows read, anonymized and written at a time (default 100 000).
+    workers : int
+        Number of processes for the hashing (default the number of CPUs, 1 hashes in this process).
+    max_cached_names : int
+        Maximum number of names whose digests are kept in memory between chunks (default 1 000 000).
+    report : callable
+        Called with a progress message after every chunk (default print, None for no messages).
+    incremental : bool
+        Hash with HMAC, keep the digests in the store and only add the rows of new Games to the output (default False).
+        The first incremental run (empty store) writes the whole output, and so does a run when the output is missing.
+    store_path : str
+        The persistent store for incremental runs (default Data/name_hashes.sqlite).
+    key : bytes
+        The HMAC key for incremental runs (default from load_key()).
+
+    Returns
+    -------
+    stats : dict
+        rows (rows written), skipped (rows of Games that were already anonymized), hashed (names hashed), seconds and rows_per_second.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    name_hashes = NameHashes(max_cached_names)
+    store = NameStore(store_path) if incremental else None
+    key = (key or load_key()) if incremental else None
+    hasher = functools.partial(hash_names, key=key)
+
+    # without the output the rows of the processed Games are gone as well, so every row is written again
+    processed_games = store.processed_games() if incremental and os.path.exists(output_path) else set()
+    append = bool(processed_games)
+    # new rows are written to a temporary file first and only appended to the output when everything has succeeded
+    write_path = f"{output_path}.new" if append else output_path
+
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    rows, skipped, hashed, new_games, start = 0, 0, 0, set(), time.perf_counter()
+
+    try:
+        with open(write_path, "w", newline="") as output:
+            for chunk in pd.read_csv(input_path, chunksize=chunk_rows, dtype=DTYPES):
+
+                if processed_games:
+                    already_processed = chunk["Games"].isin(processed_games)
+                    skipped += int(already_processed.sum())
+                    chunk = chunk[~already_processed]
+                    if chunk.empty:
+                        continue
+                new_games.update(chunk["Games"].unique())
+
+                # names that are not in memory are looked up in the store (incremental) and the rest are hashed,
+                # split into one batch per worker
+                names = [name for name in chunk["Name"].unique() if isinstance(name, str)]
+                new_names = name_hashes.missing(names)
+                if store is not None:
+                    stored = store.lookup(new_names)
+                    name_hashes.update(list(stored), list(stored.values()))
+                    new_names = [name for name in new_names if name not in stored]
+                if pool is not None and len(new_names) > workers:
+                    batch_size = -(-len(new_names) // workers)
+                    batches = [new_names[index:index + batch_size] for index in range(0, len(new_names), batch_size)]
+                    new_hashes = [digest for batch in pool.map(hasher, batches) for digest in batch]
+                else:
+                    new_hashes = hasher(new_names)
+                name_hashes.update(new_names, new_hashes)
+                if store is not None:
+                    store.add(new_names, new_hashes)
+                hashed += len(new_names)
+
+                chunk["Name"] = chunk["Name"].map(name_hashes.mapping(names))
+                # the header is only written once, and never when appending to an existing output
+                chunk.to_csv(output, header=rows == 0 and not append, index=False)
+                rows += len(chunk)
+
+                if report is not None:
+                    report(f"{rows} rows, {(rows + skipped) / (time.perf_counter() - start):,.0f} rows/s")
+
+        if append:
+            with open(write_path, "rb") as new_rows, open(output_path, "ab") as output:
+                shutil.copyfileobj(new_rows, output)
+            os.remove(write_path)
+
+        if store is not None:
+            store.add_games(new_games)
+            store.commit()
+    except BaseException:
+        if store is not None:
+            store.rollback()
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if store is not None:
+            store.close()
+
+    seconds = time.perf_counter() - start
+    return dict(rows=rows, skipped=skipped, hashed=hashed, seconds=seconds, rows_per_second=(rows + skipped) / seconds if seconds else 0.0)
 
-os_data = pd.read_csv("Data/athlete_events.csv")
 
-os_data["Name"] = os_data["Name"].apply(lambda name:hl.sha256(name.encode()).hexdigest())
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replaces the athlete names with their sha256 hex digest.")
+    parser.add_argument("--input", default=INPUT_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, help="number of hashing processes (default the number of CPUs)")
+    parser.add_argument("--incremental", action="store_true", help="keyed hashes, persistent store and only new Games are added")
+    parser.add_argument("--store", default=STORE_PATH, help="persistent store for --incremental")
+    args = parser.parse_args()
 
-os_data.to_csv("Data/athlete_events_anonymized.csv", index=False, header=True)
\ No newline at end of file
+    stats = anonymize(args.input, args.output, args.chunk_rows, args.workers, incremental=args.incremental, store_path=args.store)
+    print(f"{stats['rows']} rows written, {stats['skipped']} already anonymized, {stats['hashed']} names hashed "
+            f"in {stats['seconds']:.1f} s, {stats['rows_per_second']:,.0f} rows/s")
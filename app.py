@@ -1,8 +1,33 @@
+import time
 import dash
 import dash_bootstrap_components as dbc
+from flask import Response, g, request
+
+import background
+import metrics
 
 stylesheets = [dbc.themes.DARKLY]
 app = dash.Dash(__name__, suppress_callback_exceptions=True,  external_stylesheets=stylesheets,
+                long_callback_manager=background.make_manager(), #Runs the heavy callbacks as background jobs when BACKGROUND_CALLBACKS=1
                 meta_tags=[dict(name="viewport", content="width=device-width, initial-scale=1.0")]) #For mobile devices
 app.title = "Olympic Games USA"
-server = app.server
\ No newline at end of file
+server = app.server
+
+# metrics for every callback request: latency and response size per callback output
+@server.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+@server.after_request
+def record_callback(response):
+    if request.path.endswith("/_dash-update-component") and "start" in g:
+        callback = (request.get_json(silent=True) or {}).get("output", "unknown")
+        metrics.callback_seconds.observe(callback, time.perf_counter() - g.start)
+        metrics.callback_response_bytes.observe(callback, len(response.get_data()))
+
+    return response
+
+# Prometheus scrape endpoint
+@server.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
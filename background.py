@@ -0,0 +1,67 @@
+import functools
+import os
+import load_data
+import static_export
+
+# Background jobs for the callbacks that compute data or figures (BACKGROUND_CALLBACKS=1).
+# These callbacks then run as Dash long callbacks: the request only starts a job (a forked copy of the worker)
+# and returns, the browser polls for the result, so the gunicorn worker is free for other requests while the job runs.
+# A job is terminated when a newer request from the same browser supersedes it or when the tab is changed.
+# The jobs and their results are kept in a diskcache in BACKGROUND_CACHE_DIR that every worker shares,
+# the results are kept per dataset version, so a state that was computed once is answered without a new job.
+# Needs the diskcache, multiprocess and psutil packages (pip install diskcache multiprocess psutil).
+
+BACKGROUND_CALLBACKS = os.environ.get("BACKGROUND_CALLBACKS") == "1"
+BACKGROUND_CACHE_DIR = os.environ.get("BACKGROUND_CACHE_DIR", "Data/background")
+
+# how often the browser asks for the result of a job
+POLL_INTERVAL_MS = int(os.environ.get("BACKGROUND_POLL_MS", 250))
+
+# results not asked for within a day are removed from the cache
+RESULT_EXPIRE_SECONDS = 24 * 3600
+
+# set_progress of the job running in this process (None outside of a job)
+_set_progress = None
+
+
+def enabled() -> bool:
+    """Returns: True if the heavy callbacks run as background jobs (never in static mode, the figures are only read there)"""
+    return BACKGROUND_CALLBACKS and not static_export.static_mode()
+
+
+def make_manager():
+    """Returns: the manager for the long callbacks (None when background callbacks are off)"""
+    if not enabled():
+        return None
+
+    # only imported when background callbacks are on, the app does not need them otherwise
+    import diskcache
+    from dash.long_callback import DiskcacheLongCallbackManager
+
+    class JobManager(DiskcacheLongCallbackManager):
+        """DiskcacheLongCallbackManager that only forks a job when the dataset is loaded."""
+
+        def call_job_fn(self, key, job_fn, args):
+            # the job is forked from the worker, a fork while the loading thread holds its lock would leave the job waiting forever
+            load_data.get_sport_statistics()
+            return super().call_job_fn(key, job_fn, args)
+
+    return JobManager(diskcache.Cache(BACKGROUND_CACHE_DIR), cache_by=[load_data.dataset_version], expire=RESULT_EXPIRE_SECONDS)
+
+
+def job(function):
+    """Returns: function as the job of a long callback, it gets set_progress as its first argument and passes it to report"""
+
+    @functools.wraps(function) # the cache key of a result includes the source of the function behind __wrapped__
+    def run(set_progress, *args):
+        global _set_progress
+        _set_progress = set_progress
+        return function(*args)
+
+    return run
+
+
+def report(step: int, steps: int, label: str) -> None:
+    """Shows the progress of the running job (step of steps done, label for what it does now), does nothing outside of a job"""
+    if _set_progress is not None:
+        _set_progress((round(100 * step / steps), label))
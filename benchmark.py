@@ -0,0 +1,253 @@
+import argparse
+import hashlib
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
+
+import columnar_cache
+import load_data
+import medal_cube
+import plot_figures
+import aggregates
+import callbacks
+from figure_cache import figure_cache, figure_store
+
+# Benchmarks for load_data, SportStatistics, plot_figures and the Dash callbacks (called directly, without a server).
+# Every case is run on the dataset scaled by each scale factor, caches are cleared before every run,
+# so the numbers show the cost of computing the result (not of reading it from a cache).
+# Usage: python benchmark.py --scales 1 10 --output bench.json [--baseline baseline.json] [--data Data/athlete_events_synthetic.csv]
+
+DEFAULT_OUTPUT = "benchmark_results.json"
+
+
+def scale_dataset(world_data: pd.DataFrame, factor: int) -> pd.DataFrame:
+    """
+    Returns: the dataset repeated factor times, each copy with its own athlete IDs
+    (so participant counts grow with the data, the number of Games, sports and events stays the same)
+    """
+
+    if factor == 1:
+        return world_data
+
+    id_offset = int(world_data["ID"].max()) + 1
+    copies = []
+    for copy in range(factor):
+        scaled = world_data.copy()
+        scaled["ID"] = scaled["ID"] + copy * id_offset
+        copies.append(scaled)
+
+    return pd.concat(copies, ignore_index=True)
+
+
+def cases() -> list:
+    """Returns: list of (name, function) for everything that is benchmarked"""
+
+    # the callbacks are wrapped by Dash, __wrapped__ is the function that was decorated
+    def callback(function):
+        return getattr(function, "__wrapped__", function)
+
+    sport_statistics = load_data.get_sport_statistics
+    sports_handle = lambda statistic, gender: dict(sport="Basketball", statistic=statistic, gender=gender, version=load_data.dataset_version(), years=None)
+
+    return [
+        # loading the data file (not scaled) and the shared dataset
+        ("columnar_cache.read_table (data file)", lambda: columnar_cache.read_table(load_data.WORLD_DATA_PATH)),
+        # load_data
+        ("load_data.import_world_data", load_data.import_world_data),
+        ("load_data.import_full_data_usa", load_data.import_full_data_usa),
+        ("load_data.import_full_data_country(SWE)", lambda: load_data.import_full_data_country("SWE")),
+        ("load_data.import_medals_won", load_data.import_medals_won),
+        ("load_data.import_medals_count", load_data.import_medals_count),
+        ("load_data.import_medals_per_sport_and_event", load_data.import_medals_per_sport_and_event),
+        ("load_data.import_top_ten_sports_and_events_all_medal_types", load_data.import_top_ten_sports_and_events_all_medal_types),
+        ("load_data.import_top_ten_sports_and_events_all_medal_types(1960-1990)", lambda: load_data.import_top_ten_sports_and_events_all_medal_types(years=(1960, 1990))),
+        ("load_data.import_participants_data", load_data.import_participants_data),
+        # SportStatistics
+        ("medal_cube.OlympicCube()", lambda: medal_cube.OlympicCube(load_data.import_world_data())),
+        ("medal_cube.Cube.select+sum", lambda: load_data.get_cube().medals.select(NOC="USA", Medal="Gold").sum("Sport")),
+        ("SportStatistics()", load_data.SportStatistics),
+        ("SportStatistics.sports", lambda: sport_statistics().sports()),
+        ("SportStatistics.medals", lambda: sport_statistics().medals("Basketball", "both")),
+        ("SportStatistics.medals(1960-1990)", lambda: sport_statistics().medals("Basketball", "both", (1960, 1990))),
+        ("SportStatistics.gender", lambda: sport_statistics().gender("Basketball")),
+        ("SportStatistics.age", lambda: sport_statistics().age("Basketball")),
+        ("SportStatistics.age_summary", lambda: sport_statistics().age_summary("Basketball")),
+        ("SportStatistics.age_summary(1960-1990)", lambda: sport_statistics().age_summary("Basketball", (1960, 1990))),
+        ("SportStatistics.height_basketball", lambda: sport_statistics().height_basketball("both")),
+        # plot_figures
+        ("plot_figures.plot_medals_per_year", plot_figures.plot_medals_per_year),
+        ("plot_figures.plot_top_ten_sports_or_events", plot_figures.plot_top_ten_sports_or_events),
+        ("plot_figures.plot_participants", plot_figures.plot_participants),
+        ("plot_figures.plot_gender_distribution", plot_figures.plot_gender_distribution),
+        # callbacks
+        ("callbacks.update_sports_statistics_dropdown", lambda: callback(callbacks.update_sports_statistics_dropdown)("Basketball")),
+        ("callbacks.filtered_sports(medals)", lambda: callback(callbacks.filtered_sports)("Basketball", "medals", "both")),
+        ("callbacks.filtered_sports(age)", lambda: callback(callbacks.filtered_sports)("Basketball", "age", "both")),
+        ("callbacks.update_sports_graph(medals)", lambda: callback(callbacks.update_sports_graph)(sports_handle("medals", "both"), "medals", "Basketball", "both")),
+        ("callbacks.update_sports_graph(gender)", lambda: callback(callbacks.update_sports_graph)(sports_handle("gender", "both"), "gender", "Basketball", "both")),
+        ("callbacks.update_sports_graph(age)", lambda: callback(callbacks.update_sports_graph)(sports_handle("age", "both"), "age", "Basketball", "both")),
+        ("callbacks.update_sports_graph(athlete)", lambda: callback(callbacks.update_sports_graph)(sports_handle("athlete", "both"), "athlete", "Basketball", "both")),
+        ("callbacks.update_third_box", lambda: callback(callbacks.update_third_box)("age")),
+        ("callbacks.update_second_dropdown", lambda: callback(callbacks.update_second_dropdown)("medals")),
+        ("callbacks.update_radio_buttons", lambda: callback(callbacks.update_radio_buttons)("medals", "medals_year")),
+        ("callbacks.update_toggle_switch", lambda: callback(callbacks.update_toggle_switch)("medals", "medals_year", "all")),
+        ("callbacks.update_graph(medals_year)", lambda: callback(callbacks.update_graph)("medals", "medals_year", "all", True)),
+        ("callbacks.update_graph(top_ten_sports_events)", lambda: callback(callbacks.update_graph)("medals", "top_ten_sports_events", "all", True)),
+        ("callbacks.update_graph(top_ten_sports_events, 1960-1990)", lambda: callback(callbacks.update_graph)("medals", "top_ten_sports_events", "all", True, [1960, 1990])),
+        ("callbacks.update_graph(participants)", lambda: callback(callbacks.update_graph)("participants", "participants", "All", True)),
+        ("callbacks.update_graph(gender)", lambda: callback(callbacks.update_graph)("participants", "gender", "all", False)),
+    ]
+
+
+def clear_caches() -> None:
+    """Clears every cache that sits in front of the computations."""
+    aggregates.clear_loaded_aggregates()
+    figure_cache.clear()
+    callbacks.sports_data.cache_clear()
+    load_data.get_cube().clear_prefix_sums()
+
+
+def payload_size(result) -> int:
+    """Returns: the size in bytes of the result serialized as json (what Dash would send to the browser)"""
+
+    if isinstance(result, pd.DataFrame):
+        return len(result.to_json())
+    if isinstance(result, (list, tuple)):
+        return sum(payload_size(item) for item in result)
+    if isinstance(result, go.Figure):
+        result = result.to_plotly_json()
+
+    try:
+        return len(json.dumps(result, cls=PlotlyJSONEncoder))
+    except TypeError:
+        # not something that is sent to the browser (e.g. a SportStatistics object)
+        return 0
+
+
+def run_case(function, repeat: int) -> dict:
+    """Runs a case repeat times for the timing and once more with tracemalloc for the peak memory."""
+
+    seconds = []
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+
+    clear_caches()
+    tracemalloc.start()
+    function()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return dict(seconds_min=min(seconds),
+                seconds_median=statistics.median(seconds),
+                peak_bytes=peak_bytes,
+                payload_bytes=payload_size(result))
+
+
+def run_benchmarks(scales: list, repeat: int = 3, only: str = None) -> dict:
+    """
+    Runs every case on the dataset scaled by each scale factor.
+
+    Parameters
+    ----------
+    scales : list
+        The scale factors (1 = the dataset as it is).
+    repeat : int
+        Number of timed runs per case (default 3).
+    only : str
+        Only run the cases whose name contains this string.
+
+    Returns
+    -------
+    results : dict
+        meta (python, pandas and numpy versions, dataset version) and results (one dict per case and scale).
+    """
+
+    # the persistent figure store would answer the figure cases from disk, the figures are rendered every run instead
+    figure_store.directory = None
+
+    base_data = load_data.import_world_data()
+    base_version = load_data.dataset_version()
+    results = []
+
+    for scale in scales:
+        scaled_data = scale_dataset(base_data, scale)
+        version = hashlib.sha256(f"{base_version}-x{scale}".encode()).hexdigest()
+        load_data.set_world_data(scaled_data, version)
+        # built before the cases, so it is not part of the first case that uses it
+        load_data.get_sport_statistics()
+
+        for name, function in cases():
+            if only is not None and only not in name:
+                continue
+            result = dict(name=name, scale=scale, rows=len(scaled_data), **run_case(function, repeat))
+            results.append(result)
+            print(f"x{scale:<4} {name:<60} {result['seconds_median'] * 1000:10.2f} ms {result['peak_bytes'] / 2**20:9.2f} MiB {result['payload_bytes']:>10} B")
+
+    meta = dict(python=platform.python_version(), pandas=pd.__version__, numpy=np.__version__,
+                dataset_version=base_version, repeat=repeat, created=time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+    return dict(meta=meta, results=results)
+
+
+def compare(results: dict, baseline: dict, threshold: float = 1.2) -> list:
+    """
+    Compares results with a baseline and prints the ratio of the median times.
+
+    Returns
+    -------
+    regressions : list
+        The (name, scale, ratio) of the cases that got slower than threshold times the baseline.
+    """
+
+    baseline_times = {(result["name"], result["scale"]): result["seconds_median"] for result in baseline["results"]}
+    regressions = []
+
+    print(f"\n{'case':<66} {'baseline ms':>12} {'now ms':>10} {'ratio':>7}")
+    for result in results["results"]:
+        key = (result["name"], result["scale"])
+        if key not in baseline_times:
+            continue
+        ratio = result["seconds_median"] / max(baseline_times[key], 1e-9)
+        flag = " SLOWER" if ratio > threshold else ""
+        print(f"x{result['scale']:<4} {result['name']:<60} {baseline_times[key] * 1000:12.2f} {result['seconds_median'] * 1000:10.2f} {ratio:7.2f}{flag}")
+        if ratio > threshold:
+            regressions.append((result["name"], result["scale"], ratio))
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks load_data, SportStatistics, plot_figures and the callbacks at several data scales.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="only run the cases whose name contains this string")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="results file (json)")
+    parser.add_argument("--baseline", help="results file to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2, help="ratio to the baseline that counts as a regression")
+    parser.add_argument("--data", help="data file to use instead of the real dataset (e.g. made by generate_dataset.py)")
+    args = parser.parse_args()
+
+    if args.data:
+        load_data.WORLD_DATA_PATH = args.data
+        load_data.reload_world_data()
+
+    results = run_benchmarks(args.scales, args.repeat, args.only)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than {args.threshold}x the baseline")
+            raise SystemExit(1)
@@ -1,12 +1,22 @@
+import functools
+import itertools
+import json
 import plotly_express as px
 import pandas as pd
-import plotly.figure_factory as ff
+import numpy as np
+import plotly.graph_objects as go
 
 from dash.dependencies import Output, Input
 from app import app
-from noc_to_region import noc_to_region
-from layouts import sport_statistics, gender_selection, hidden_gender_selection
+from noc_to_region import noc_to_regions
+from layouts import usa_options_dict, sport_options_dropdown, year_range
 import plot_figures
+import load_data
+import metrics
+import background
+from figure_cache import memoize_figure
+from single_flight import single_flight
+from static_export import static_figure, static_mode, manifest
 
 # dictionaries sports
 
@@ -37,51 +47,149 @@ medals_per_sport_options_dict = dict(all = "All medals", total = "Total number o
 plot_participants_options_dict = dict(All = "All seasons", Summer = "Summer", Winter = "Winter", Percentage = "American Participants (%)")
 gender_options_dict = dict(all = "All seasons", summer = "Summer", winter = "Winter")
 
+# CLIENTSIDE CALLBACKS
+
+# The callbacks that only update the controls run in the browser, so only the graphs need the server.
+# Their JavaScript is generated from the Python functions below: each function is called for every combination
+# of the values its inputs can have and the browser looks the results up in that table.
+def clientside_lookup(function, *input_values) -> str:
+    """Returns: a JavaScript function that returns the same as function for every combination of input_values"""
+    table = {json.dumps(args, separators=(",", ":")): function(*args) for args in itertools.product(*input_values)}
+
+    return ("function(...args) {\n"
+            f"    const table = {json.dumps(table)};\n"
+            "    const key = JSON.stringify(args);\n"
+            "    if (!(key in table)) { throw window.dash_clientside.PreventUpdate; }\n"
+            "    return table[key];\n"
+            "}")
+
+# YEAR SLIDERS
+
+def year_window(years):
+    """Returns: the value of a year slider as (first year, last year), None for the full range (or no value)"""
+    if not years or list(years) == list(year_range):
+        return None
+
+    return tuple(years)
+
+def full_range_only(key_arguments) -> bool:
+    """Returns: True for a figure of the full year range, only these are kept in the persistent figure store (the year windows are too many)"""
+    return key_arguments["years"] is None
+
+# BACKGROUND JOBS
+
+def heavy_callback(*dependencies, progress_bar, ignore=()):
+    """
+    app.callback for the callbacks that compute data or figures.
+    With background callbacks on (see background.py) the callback runs as a background job instead:
+    progress_bar (the id of a dbc.Progress) shows the progress of the job, a newer request from the same browser
+    or a change of tab terminates it, and ignore are the positions of the arguments that are not part of the result key.
+    """
+    if not background.enabled():
+        return app.callback(*dependencies)
+
+    def decorator(function):
+        app.long_callback(*dependencies,
+                        running=[(Output(progress_bar, "style"), {}, {"display" : "none"})],
+                        progress=[Output(progress_bar, "value"), Output(progress_bar, "label")],
+                        progress_default=[0, ""],
+                        cancel=[Input("tabs", "value")],
+                        interval=background.POLL_INTERVAL_MS,
+                        cache_args_to_ignore=list(ignore))(background.job(function))
+
+        # the function itself is returned like app.callback does, static_export and prewarm call its __wrapped__
+        @functools.wraps(function)
+        def registered(*args, **kwargs):
+            return function(*args, **kwargs)
+
+        return registered
+
+    return decorator
+
 # CALLBACKS SPORTS
 
 # shows and hides "Mean height" that is only available for Basketball
-@app.callback(
-    Output("sport-statistics", "options"),
-    Output("sport-statistics", "value"),
-    Input("sports-dropdown", "value")
-)
 def update_sports_statistics_dropdown(sport):
     if sport == "Basketball":
         return [{"label" : sport_statistics_dict[index], "value" : index} for index in sport_statistics_dict], "age"
     else:
         return [{"label" : no_athlete_info_dict[index], "value" : index} for index in no_athlete_info_dict], "age"
 
-
-# updates dcc.Store based on chosen sport and stat
-@app.callback(
-    Output("sports-data", "data"),
-    Input("sports-dropdown", "value"),
-    Input("sport-statistics", "value"),
-    Input("gender-selection", "value")
+app.clientside_callback(
+    clientside_lookup(update_sports_statistics_dropdown, [option["value"] for option in sport_options_dropdown]),
+    Output("sport-statistics", "options"),
+    Output("sport-statistics", "value"),
+    Input("sports-dropdown", "value")
 )
-def filtered_sports(sport, statistic, gender):
+
+
+# server side store for the sports data, the dcc.Store only holds the key (a handle) to the data
+# the data stays in the server process, so it is not serialized and sent to the browser and back
+# concurrent requests for the same data (not in the cache yet) wait for one computation
+@functools.lru_cache(maxsize=128)
+@single_flight
+def sports_data(sport, statistic, gender, version, years=None) -> pd.DataFrame:
+    """Returns: the data for the chosen sport, statistic, gender and year window (version is the dataset version, part of the key)"""
+    sport_statistics = load_data.get_sport_statistics()
+
     if statistic == "medals":
-        return sport_statistics.medals(sport, gender).to_json()
+        return sport_statistics.medals(sport, gender, years)
 
     if statistic == "gender":
-        return sport_statistics.gender(sport).to_json()
+        return sport_statistics.gender(sport, years)
         
     if statistic == "age":
-        return sport_statistics.age(sport).to_json()
+        return sport_statistics.age_summary(sport, years)
     
     if statistic == "athlete":
-        return sport_statistics.height_basketball(gender).to_json()
+        return sport_statistics.height_basketball(gender, years)
 
-# displays graph
+metrics.register_cache("sports_data", lambda: sports_data.cache_info()._asdict())
+
+# updates dcc.Store based on chosen sport and stat
 @app.callback(
+    Output("sports-data", "data"),
+    Input("sports-dropdown", "value"),
+    Input("sport-statistics", "value"),
+    Input("gender-selection", "value"),
+    Input("sports-years", "value")
+)
+def filtered_sports(sport, statistic, gender, years=None):
+    # in static mode the graph is read from the export, there is no data to prepare
+    if static_mode():
+        return dict(sport=sport, statistic=statistic, gender=gender, version=manifest()["dataset_sha256"], years=None)
+
+    handle = dict(sport=sport, statistic=statistic, gender=gender, version=load_data.dataset_version(), years=year_window(years))
+
+    # computes the data now, so it is ready when the graph asks for it (a background job computes it instead of the worker)
+    if not background.enabled():
+        handle_data(handle)
+
+    return handle
+
+def handle_data(handle):
+    """Returns: the sports data for a handle (the year window is a list after the round trip through the browser)"""
+    return sports_data(handle["sport"], handle["statistic"], handle["gender"], handle["version"], year_window(handle.get("years")))
+
+# displays graph
+@heavy_callback(
     Output("sports-graph", "figure"),   # return outputs to here
-    Input("sports-data", "data"),       # gets data
+    Input("sports-data", "data"),       # gets the handle to the data
     Input("sport-statistics", "value"), # select which statistic that should be shown
     Input("sports-dropdown", "value"),  # get which sport that is selected
-    Input("gender-selection", "value")  # get which gender that is selected
+    Input("gender-selection", "value"), # get which gender that is selected
+    Input("sports-years", "value"),     # get which years that are selected
+    progress_bar="sports-progress",
+    ignore=[0]                          # the handle is not part of the key of a background result
 )
-def update_sports_graph(df_json, statistic, sport, gender):
-    data = pd.read_json(df_json)
+@static_figure(ignore=["data_handle"]) # the handle is derived from the other inputs
+@memoize_figure(ignore=["data_handle"], key_values=dict(years=year_window), persist=full_range_only)
+def update_sports_graph(data_handle, statistic, sport, gender, years=None):
+    background.report(0, 2, "Computing the statistics")
+    # another worker may have created the handle, then the data is computed here (from the handle)
+    data = handle_data(data_handle)
+    years = year_window(years)
+    background.report(1, 2, "Drawing the figure")
 
     # most medals per country
     if statistic == "medals":
@@ -93,13 +201,13 @@ def update_sports_graph(df_json, statistic, sport, gender):
                     text="Medal")
         
         # layout and colors
-        fig.update_layout(title=f"Countries with most medals in {sport.lower()}", 
+        fig.update_layout(title=plot_figures.years_in_title(f"Countries with most medals in {sport.lower()}", years), 
                             template='plotly_dark', 
                             paper_bgcolor= 'rgba(0, 0, 0, 0)', 
                             plot_bgcolor= 'rgba(0, 0, 0, 0)')
         fig.update_xaxes(tickmode='array',
                         tickvals = data["NOC"],
-                        ticktext=[noc_to_region(NOC) for NOC in data["NOC"]],
+                        ticktext=noc_to_regions(data["NOC"]),
                         gridcolor='gray', zerolinecolor='gray')
         fig.update_yaxes(gridcolor='gray', zerolinecolor='gray')
                 
@@ -113,7 +221,7 @@ def update_sports_graph(df_json, statistic, sport, gender):
                         color_discrete_sequence=line_colors)
         
         # layout and colors
-        fig.update_layout(title=f"Gender distribution for {sport.lower()}", 
+        fig.update_layout(title=plot_figures.years_in_title(f"Gender distribution for {sport.lower()}", years), 
                             template='plotly_dark', 
                             paper_bgcolor= 'rgba(0, 0, 0, 0)', 
                             plot_bgcolor= 'rgba(0, 0, 0, 0)')
@@ -124,37 +232,31 @@ def update_sports_graph(df_json, statistic, sport, gender):
 
     # age distribution
     if statistic == "age":
-        # both genders
-        if gender == "both":
-            # ff.create_distplot needs the data as list of lists
-            data_split = [data[data["Male"].notna()]["Male"], data[data["Female"].notna()]["Female"]]
-            fig = ff.create_distplot(data_split, 
-                                    data.columns, 
-                                    curve_type="normal", 
-                                    show_hist=False, 
-                                    show_rug=False, 
-                                    colors=line_colors)
-        # only male
-        elif gender == "male":
-            fig = ff.create_distplot([data[data["Male"].notna()]["Male"]], ["Male"], 
-                                        curve_type="normal", 
-                                        show_hist=False, 
-                                        show_rug=False, 
-                                        colors=male_color)
-        # only female
-        else: 
-           fig = ff.create_distplot([data[data["Female"].notna()]["Female"]], ["Female"], 
-                                    curve_type="normal", 
-                                    show_hist=False, 
-                                    show_rug=False, 
-                                    colors=female_color)
+        # same curves as ff.create_distplot(curve_type="normal"), computed from the age summary instead of every age
+        genders = dict(both=["Male", "Female"], male=["Male"], female=["Female"])[gender]
+        colors = dict(both=line_colors, male=male_color, female=female_color)[gender]
+        fig = go.Figure(layout=dict(barmode="overlay",
+                                    hovermode="closest",
+                                    legend=dict(traceorder="reversed"),
+                                    xaxis1=dict(domain=[0.0, 1.0], anchor="y2", zeroline=False),
+                                    yaxis1=dict(domain=[0.0, 1], anchor="free", position=0.0)))
+        for name, color in zip(genders, colors):
+            if data[name]["count"] > 0:
+                fig.add_trace(go.Scatter(normal_curve(data[name]), 
+                                        mode="lines", 
+                                        name=name, 
+                                        legendgroup=name, 
+                                        showlegend=True, 
+                                        xaxis="x", 
+                                        yaxis="y", 
+                                        marker=dict(color=color)))
        
         # hover format
         hover_template = "<br>Age: %{x:.1f}<extra></extra>"
         fig.update_traces(hovertemplate=hover_template)
 
         # layout and colors
-        fig.update_layout(title=f"Normal distribution for ages in {sport.lower()}", 
+        fig.update_layout(title=plot_figures.years_in_title(f"Normal distribution for ages in {sport.lower()}", years), 
                             xaxis_title="Age", 
                             yaxis_title="Density", 
                             template='plotly_dark', 
@@ -167,6 +269,9 @@ def update_sports_graph(df_json, statistic, sport, gender):
     
     # mean height for Basketball
     if statistic == "athlete":
+
+        # the mean heights are formatted as strings with two decimals, the bar heights need numbers
+        data = data.astype({"Mean height": float})
         
         # change color depending on gender
         if gender == "male":
@@ -184,7 +289,7 @@ def update_sports_graph(df_json, statistic, sport, gender):
                     color_discrete_sequence=bar_color)
         
         # layout and colors
-        fig.update_layout(title=f"Mean height of players per medal", 
+        fig.update_layout(title=plot_figures.years_in_title(f"Mean height of players per medal", years), 
                             template='plotly_dark', 
                             paper_bgcolor= 'rgba(0, 0, 0, 0)', 
                             plot_bgcolor= 'rgba(0, 0, 0, 0)')
@@ -193,31 +298,33 @@ def update_sports_graph(df_json, statistic, sport, gender):
                
         return fig
 
-# show or hide the gender selection card
-@app.callback(
-    Output("third-box", "children"),
-    Input("sport-statistics", "value")
-)
-def update_third_box(statistic):
-    if statistic == "medals":
-        return gender_selection
+def normal_curve(summary) -> dict:
+    """Returns: x and y of the normal distribution fitted to an age summary, 500 points from the youngest to the oldest age"""
+    # no curve when every age is the same or there is a single athlete (std 0 or NaN)
+    if not summary["std"] > 0:
+        return dict(x=[], y=[])
+
+    x = summary["min"] + np.arange(500) * (summary["max"] - summary["min"]) / 500
+    y = np.exp(-0.5 * ((x - summary["mean"]) / summary["std"]) ** 2) / (summary["std"] * np.sqrt(2 * np.pi))
+
+    return dict(x=x, y=y)
 
+# show or hide the gender selection card (hidden for the gender distribution), the selection starts at "both" for every statistic
+def update_third_box(statistic):
     if statistic == "gender":
-        return hidden_gender_selection
+        return {"display" : "none"}, "both"
 
-    if statistic == "age":
-        return gender_selection
-    
-    if statistic == "athlete":
-        return gender_selection
+    return {}, "both"
+
+app.clientside_callback(
+    clientside_lookup(update_third_box, list(sport_statistics_dict)),
+    Output("third-box", "style"),
+    Output("gender-selection", "value"),
+    Input("sport-statistics", "value")
+)
 
 # CALLBACKS USA
 
-@app.callback(
-    Output("second-dropdown", "options"),
-    Output("second-dropdown", "value"),
-    Input("usa-dropdown", "value")
-)
 def update_second_dropdown(choice):
     """Updates the second dropdown, based on the choice in the first dropdown."""
     
@@ -227,13 +334,6 @@ def update_second_dropdown(choice):
         return [{"label" : participants_options_dict[index], "value" : index} for index in participants_options_dict], "participants"
     
 
-@app.callback(
-    Output("radio-settings", "options"),
-    Output("radio-settings", "value"),
-    Output("my-toggle-switch", "value"),
-    Input("usa-dropdown", "value"),
-    Input("second-dropdown", "value")
-)
 def update_radio_buttons(usa_dropdown_choice, second_dropdown_choice):
     """Updates the radio buttons, based on the choice in the second dropdown."""
 
@@ -249,13 +349,6 @@ def update_radio_buttons(usa_dropdown_choice, second_dropdown_choice):
             return [{"label" : label, "value" : value} for value, label in gender_options_dict.items()], "all", False
 
 
-@app.callback(
-    Output("my-toggle-switch", component_property="label"),
-    Output("my-toggle-switch", component_property="disabled"),
-    Input("usa-dropdown", "value"),
-    Input("second-dropdown", "value"),
-    Input("radio-settings", "value")
-)
 def update_toggle_switch(usa_dropdown_choice, second_dropdown_choice, radio_button_choice):
     """Updates the toggle switch labels or disables it."""
 
@@ -271,24 +364,62 @@ def update_toggle_switch(usa_dropdown_choice, second_dropdown_choice, radio_butt
             return ("Not available", True) 
 
 
-@app.callback(
+# every value the USA controls can have
+second_dropdown_values = list(medals_options_dict) + list(participants_options_dict)
+radio_values = list(dict.fromkeys(itertools.chain(medals_per_year_options_dict, medals_per_sport_options_dict, 
+                                                    plot_participants_options_dict, gender_options_dict)))
+
+app.clientside_callback(
+    clientside_lookup(update_second_dropdown, list(usa_options_dict)),
+    Output("second-dropdown", "options"),
+    Output("second-dropdown", "value"),
+    Input("usa-dropdown", "value")
+)
+
+app.clientside_callback(
+    clientside_lookup(update_radio_buttons, list(usa_options_dict), second_dropdown_values),
+    Output("radio-settings", "options"),
+    Output("radio-settings", "value"),
+    Output("my-toggle-switch", "value"),
+    Input("usa-dropdown", "value"),
+    Input("second-dropdown", "value")
+)
+
+app.clientside_callback(
+    clientside_lookup(update_toggle_switch, list(usa_options_dict), second_dropdown_values, radio_values),
+    Output("my-toggle-switch", component_property="label"),
+    Output("my-toggle-switch", component_property="disabled"),
+    Input("usa-dropdown", "value"),
+    Input("second-dropdown", "value"),
+    Input("radio-settings", "value")
+)
+
+
+@heavy_callback(
     Output("usa-graph", "figure"),
     Input("usa-dropdown", "value"),
     Input("second-dropdown", "value"),
     Input("radio-settings", "value"),
-    Input("my-toggle-switch", "value")
+    Input("my-toggle-switch", "value"),
+    Input("usa-years", "value"),
+    progress_bar="usa-progress"
 )
-def update_graph(usa_dropdown_choice, second_dropdown_choice, radio_buttons_choice, switch_choice):
-    """Updates the graph, using the input values from radio buttons and toggle switch."""
+@static_figure
+@memoize_figure(key_values=dict(years=year_window), persist=full_range_only)
+def update_graph(usa_dropdown_choice, second_dropdown_choice, radio_buttons_choice, switch_choice, years=None):
+    """Updates the graph, using the input values from radio buttons, toggle switch and year slider."""
+
+    years = year_window(years)
+    background.report(0, 1, "Computing the figure")
 
     if usa_dropdown_choice == "medals":
         if second_dropdown_choice == "medals_year":
-            return plot_figures.plot_medals_per_year(season=radio_buttons_choice, percentage=switch_choice)
+            return plot_figures.plot_medals_per_year(season=radio_buttons_choice, percentage=switch_choice, years=years)
         else:
-            return plot_figures.plot_top_ten_sports_or_events(y_data=radio_buttons_choice, sport=switch_choice) 
+            return plot_figures.plot_top_ten_sports_or_events(y_data=radio_buttons_choice, sport=switch_choice, years=years) 
 
     else:
         if second_dropdown_choice == "participants":
-            return plot_figures.plot_participants(data_to_show=radio_buttons_choice, log_scaled=switch_choice)
+            return plot_figures.plot_participants(data_to_show=radio_buttons_choice, log_scaled=switch_choice, years=years)
         else:
-            return plot_figures.plot_gender_distribution(radio_buttons_choice)
\ No newline at end of file
+            return plot_figures.plot_gender_distribution(radio_buttons_choice, years=years)
\ No newline at end of file
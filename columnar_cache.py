@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+# Columnar binary cache of the csv files in Data/.
+# Every column is stored as a .npy file, string columns are dictionary encoded (int32 codes + unique values),
+# so a table can be loaded without parsing any text and only the needed columns have to be read.
+# The manifest records a sha256 of the source csv file and the cache is rebuilt when the file changes.
+# Every build writes its columns to a new directory next to the manifest and then replaces the manifest,
+# which names that directory, so a reader always finds a complete set of columns.
+
+CACHE_DIR = "Data/cache"
+FORMAT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+
+
+def source_hash(csv_path: str) -> str:
+    """Returns: sha256 hex digest of the content of a file"""
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def table_dir(csv_path: str, cache_dir: str = CACHE_DIR) -> str:
+    """Returns: the directory with the manifest and the column directories of a csv file"""
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, name)
+
+
+def build_cache(csv_path: str, cache_dir: str = CACHE_DIR, digest: Optional[str] = None) -> dict:
+    """
+    Converts a csv file into typed .npy columns and writes a manifest with the content hash of the file.
+
+    Parameters
+    ----------
+    csv_path : str
+        The csv file to convert.
+    cache_dir : str
+        The directory to store the cache in (default Data/cache).
+    digest : str
+        The sha256 of the csv file, if it has already been calculated.
+
+    Returns
+    -------
+    manifest : dict
+        The manifest of the new cache.
+    """
+
+    if digest is None:
+        digest = source_hash(csv_path)
+    stat = os.stat(csv_path)
+    data = pd.read_csv(csv_path)
+
+    # the columns are written to a temporary directory first and renamed to a new version directory when complete
+    target = table_dir(csv_path, cache_dir)
+    version = f"{digest[:16]}.{time.time_ns()}.{os.getpid()}"
+    tmp_dir = os.path.join(target, f"{version}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for column in data.columns:
+        values = data[column]
+        # strings are object columns, or string columns where pandas infers a string dtype
+        if pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            codes, uniques = pd.factorize(values)
+            np.save(os.path.join(tmp_dir, f"{column}.codes.npy"), codes.astype(np.int32))
+            np.save(os.path.join(tmp_dir, f"{column}.values.npy"), np.asarray(uniques, dtype=str))
+            columns.append(dict(name=column, kind="string"))
+        else:
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), values.to_numpy())
+            columns.append(dict(name=column, kind="numeric", dtype=str(values.dtype)))
+
+    os.replace(tmp_dir, os.path.join(target, version))
+
+    manifest = dict(format_version=FORMAT_VERSION,
+                    source=csv_path,
+                    sha256=digest,
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    rows=len(data),
+                    columns_dir=version,
+                    columns=columns)
+
+    # switching the manifest is atomic, readers see either the previous version or the new one
+    previous = _read_manifest(target)
+    _write_manifest(target, manifest)
+    _remove_old_versions(target, keep={version, previous["columns_dir"]} if previous else {version})
+
+    return manifest
+
+
+def ensure_cache(csv_path: str, cache_dir: str = CACHE_DIR) -> dict:
+    """
+    Returns the manifest of an up to date cache of the csv file, building the cache first if it is missing or stale.
+    The size and modification time of the file are checked first, the content hash is only calculated when they differ.
+    If the csv file does not exist, an existing cache is used as it is.
+    """
+
+    manifest = _read_manifest(table_dir(csv_path, cache_dir))
+
+    if not os.path.exists(csv_path):
+        if manifest is None:
+            raise FileNotFoundError(csv_path)
+        return manifest
+
+    if manifest is None:
+        return build_cache(csv_path, cache_dir)
+
+    stat = os.stat(csv_path)
+    if manifest["size"] == stat.st_size and manifest["mtime_ns"] == stat.st_mtime_ns:
+        return manifest
+
+    digest = source_hash(csv_path)
+    if digest != manifest["sha256"]:
+        return build_cache(csv_path, cache_dir, digest)
+
+    # the file was touched but the content is the same, remember the new modification time
+    manifest["size"], manifest["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+    _write_manifest(table_dir(csv_path, cache_dir), manifest)
+
+    return manifest
+
+
+def read_table(csv_path: str, columns: Optional[List[str]] = None, cache_dir: str = CACHE_DIR,
+                dtypes: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Loads a csv file from its columnar cache (the cache is built or rebuilt when needed).
+
+    Parameters
+    ----------
+    csv_path : str
+        The csv file to load.
+    columns : list
+        The columns to read (default all columns, in the order of the csv file).
+    cache_dir : str
+        The directory where the cache is stored (default Data/cache).
+    dtypes : dict
+        Column -> dtype for columns that should not get the default type (e.g. "category" or "int32").
+        String columns read as "category" are built directly from the stored codes, with the categories sorted.
+
+    Returns
+    -------
+    pd.DataFrame
+        The same dataframe as pd.read_csv would return (for the selected columns, with the given dtypes).
+    """
+
+    manifest = ensure_cache(csv_path, cache_dir)
+    directory = os.path.join(table_dir(csv_path, cache_dir), manifest["columns_dir"])
+
+    kinds = {column["name"]: column["kind"] for column in manifest["columns"]}
+    if columns is None:
+        columns = list(kinds)
+    else:
+        unknown = [column for column in columns if column not in kinds]
+        if unknown:
+            raise KeyError(f"Columns not in {csv_path}: {unknown}")
+
+    dtypes = dtypes or {}
+    data = {}
+    for column in columns:
+        if kinds[column] == "string" and dtypes.get(column) == "category":
+            data[column] = _read_categorical(directory, column)
+        elif kinds[column] == "string":
+            codes = np.load(os.path.join(directory, f"{column}.codes.npy"))
+            # missing values have code -1, which picks the NaN appended last
+            uniques = np.append(np.load(os.path.join(directory, f"{column}.values.npy")).astype(object), np.nan)
+            data[column] = uniques[codes]
+        else:
+            data[column] = np.load(os.path.join(directory, f"{column}.npy"))
+            if column in dtypes:
+                data[column] = data[column].astype(dtypes[column])
+
+    return pd.DataFrame(data, columns=columns)
+
+
+def _read_categorical(directory: str, column: str) -> pd.Categorical:
+    """Returns: a string column as a categorical with sorted categories (the stored values are in order of appearance)"""
+
+    codes = np.load(os.path.join(directory, f"{column}.codes.npy"))
+    values = np.load(os.path.join(directory, f"{column}.values.npy"))
+
+    # rank of each stored value in sorted order, the missing values keep code -1
+    order = np.argsort(values, kind="stable")
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    codes = np.where(codes >= 0, rank[codes], -1).astype(np.int32)
+
+    return pd.Categorical.from_codes(codes, categories=values[order].astype(object))
+
+
+def _read_manifest(directory: str) -> Optional[dict]:
+    """Returns: the manifest in the directory, or None if it is missing or has an old format"""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        return None
+
+    return manifest
+
+
+def _write_manifest(directory: str, manifest: dict) -> None:
+    """Writes the manifest atomically"""
+    tmp_path = os.path.join(directory, f"{MANIFEST_FILE}.tmp-{os.getpid()}")
+    with open(tmp_path, "w") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+
+def _remove_old_versions(target: str, keep: set) -> None:
+    """Removes the column directories (and files of older formats) except keep, the previous version is kept for readers still using it"""
+    for entry in os.listdir(target):
+        if entry in keep or entry.startswith(MANIFEST_FILE) or entry.endswith(".tmp"):
+            continue
+
+        path = os.path.join(target, entry)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the columnar cache of the csv files in Data/.")
+    parser.add_argument("csv_files", nargs="*", default=["Data/athlete_events_anonymized.csv", "Data/noc_regions.csv"])
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="rebuild even if the cache is up to date")
+    args = parser.parse_args()
+
+    for csv_file in args.csv_files:
+        manifest = build_cache(csv_file, args.cache_dir) if args.force else ensure_cache(csv_file, args.cache_dir)
+        print(f"{csv_file}: {manifest['rows']} rows, sha256 {manifest['sha256'][:12]}")
@@ -0,0 +1,45 @@
+import aggregates
+import callbacks
+from layouts import year_range
+
+# Every combination of inputs the dashboard can send to the figure callbacks.
+# The options come from the same dictionaries the callbacks use to fill the dropdowns and radio buttons,
+# so a new option there is also a new state here.
+# The year sliders are at the full range in every state (a window of years is computed when it is asked for).
+
+GENDERS = ["both", "male", "female"]
+
+
+def sports_states() -> list:
+    """Returns: list of (sport, statistic, gender, sports-years) for update_sports_graph"""
+
+    states = []
+    for sport in aggregates.sports():
+        statistics = callbacks.sport_statistics_dict if sport == "Basketball" else callbacks.no_athlete_info_dict
+        for statistic in statistics:
+            # the gender selection is hidden (and "both") for the gender distribution
+            genders = ["both"] if statistic == "gender" else GENDERS
+            states.extend((sport, statistic, gender, list(year_range)) for gender in genders)
+
+    return states
+
+
+def usa_states() -> list:
+    """Returns: list of (usa-dropdown, second-dropdown, radio-settings, my-toggle-switch, usa-years) for update_graph"""
+
+    radio_options = dict(medals_year=callbacks.medals_per_year_options_dict,
+                        top_ten_sports_events=callbacks.medals_per_sport_options_dict,
+                        participants=callbacks.plot_participants_options_dict,
+                        gender=callbacks.gender_options_dict)
+    second_options = dict(medals=callbacks.medals_options_dict, participants=callbacks.participants_options_dict)
+
+    states = []
+    for usa_choice, options in second_options.items():
+        for second_choice in options:
+            # the toggle switch is set to False and disabled for the gender distribution
+            switch_choices = [False] if second_choice == "gender" else [True, False]
+            states.extend((usa_choice, second_choice, radio_choice, switch_choice, list(year_range))
+                            for radio_choice in radio_options[second_choice]
+                            for switch_choice in switch_choices)
+
+    return states
@@ -0,0 +1,241 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import string
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+import plotly.io as pio
+import load_data
+import metrics
+import single_flight
+
+# Memoization of the dashboard figures.
+# The figures only depend on a few dropdown/radio/toggle values and the dataset, so a figure is built once,
+# stored as serialized plotly json and returned from the cache on the next request with the same inputs.
+# Behind the in-memory cache is a persistent store on disk, shared by every process and kept across restarts
+# (prewarm.py fills it with every dashboard state). The store has a directory per dataset version,
+# the directories of older versions are removed when the first figure of a new version is stored.
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_STORE_DIR = "Data/figures"
+
+
+class FigureCache:
+    """LRU cache of serialized figures, bounded by the total size of the stored json."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._figures = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key) -> Optional[bytes]:
+        """Returns: the stored figure json for the key (None if it is not cached)"""
+        with self._lock:
+            figure_json = self._figures.get(key)
+            if figure_json is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._figures.move_to_end(key)
+
+            return figure_json
+
+    def put(self, key, figure_json: bytes) -> None:
+        """Stores a figure json, evicting the least recently used figures when the byte budget is exceeded."""
+
+        # a figure larger than the whole budget is not stored
+        if len(figure_json) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._figures:
+                self._bytes -= len(self._figures.pop(key))
+
+            self._figures[key] = figure_json
+            self._bytes += len(figure_json)
+
+            while self._bytes > self.max_bytes:
+                _, evicted = self._figures.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Removes all figures (the counters are kept)."""
+        with self._lock:
+            self._figures.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Returns: hits, misses, evictions, number of figures and bytes used"""
+        with self._lock:
+            return dict(hits=self.hits,
+                        misses=self.misses,
+                        evictions=self.evictions,
+                        figures=len(self._figures),
+                        bytes=self._bytes,
+                        max_bytes=self.max_bytes)
+
+
+class FigureStore:
+    """Persistent store of serialized figures, one json file per key in a directory per dataset version (directory None turns the store off)."""
+
+    def __init__(self, directory: Optional[str] = DEFAULT_STORE_DIR) -> None:
+        self.directory = directory
+        # the dataset version whose directory was created (and the older ones removed) by this process
+        self._version = None
+        self._lock = threading.Lock()
+
+    def version_dir(self) -> str:
+        """Returns: the directory with the figures of the current dataset version"""
+        return os.path.join(self.directory, load_data.dataset_version()[:16])
+
+    def path(self, key) -> str:
+        """Returns: the file for a key (the key is hashed, so the name is the same in every process)"""
+        return os.path.join(self.version_dir(), f"{hashlib.sha256(repr(key).encode()).hexdigest()}.json")
+
+    def get(self, key) -> Optional[bytes]:
+        """Returns: the stored figure json for the key (None if it is not stored)"""
+        if self.directory is None:
+            return None
+
+        try:
+            with open(self.path(key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, figure_json: bytes) -> None:
+        """Stores a figure json (written to a temporary file first, so readers never see half a file)."""
+        if self.directory is None:
+            return
+
+        path = self.path(key)
+        self._prepare(os.path.dirname(path))
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary_path, "wb") as file:
+                file.write(figure_json)
+            os.replace(temporary_path, path)
+        except FileNotFoundError:
+            # a process with a newer dataset removed the directory, the figure is not needed anymore
+            pass
+
+    def _prepare(self, version_dir: str) -> None:
+        """Creates the directory of the current dataset version and removes the figures of the other versions (once per version)."""
+
+        with self._lock:
+            if self._version == version_dir:
+                return
+
+            os.makedirs(version_dir, exist_ok=True)
+            current = os.path.basename(version_dir)
+            for entry in os.scandir(self.directory):
+                if entry.name == current:
+                    continue
+                # only what the store itself writes: version directories and figure files of the flat layout of earlier releases
+                if entry.is_dir() and len(entry.name) == 16 and set(entry.name) <= set(string.hexdigits):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                elif entry.is_file() and entry.name.endswith((".json", ".tmp")):
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+
+            self._version = version_dir
+
+
+# the cache shared by all figure functions in this process, the budget can be set with FIGURE_CACHE_MAX_BYTES
+figure_cache = FigureCache(int(os.environ.get("FIGURE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)))
+metrics.register_cache("figure", figure_cache.stats)
+
+# the store shared by all processes, the directory can be set with FIGURE_STORE_DIR (an empty value turns it off)
+figure_store = FigureStore(os.environ.get("FIGURE_STORE_DIR", DEFAULT_STORE_DIR) or None)
+
+
+def memoize_figure(function=None, *, ignore: Iterable[str] = (), key_values: dict = None, persist=None):
+    """
+    Decorator that caches the figure returned by a function in figure_cache and figure_store.
+    The key is the function name, its arguments (except the ones in ignore) and the dataset version.
+    The decorated function returns the figure as a dict (plotly json), which Dash accepts as a figure.
+
+    Parameters
+    ----------
+    ignore : Iterable[str]
+        Names of arguments that do not change the figure (for example data that is derived from the other arguments).
+    key_values : dict
+        Argument name -> function that returns the value used in the key, so that values giving the same figure share one entry.
+    persist : callable
+        Called with the key arguments (a dict), figures for which it returns False are only kept in figure_cache,
+        not in figure_store (for arguments with too many values to keep on disk). Default every figure is stored.
+    """
+
+    if function is None:
+        return functools.partial(memoize_figure, ignore=ignore, key_values=key_values, persist=persist)
+
+    signature = inspect.signature(function)
+    ignore = set(ignore)
+    key_values = key_values or {}
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        key_arguments = {name: key_values[name](value) if name in key_values else value
+                        for name, value in arguments.arguments.items() if name not in ignore}
+        key = (function.__module__,
+                function.__qualname__,
+                tuple((name, _hashable(value)) for name, value in key_arguments.items()),
+                load_data.dataset_version())
+        store = figure_store if persist is None or persist(key_arguments) else None
+
+        figure_json = figure_cache.get(key)
+        if figure_json is None:
+            # concurrent requests for the same figure wait for one computation
+            figure_json = single_flight.flights.do(key, lambda: _stored_or_computed(key, function, args, kwargs, store))
+            figure_cache.put(key, figure_json)
+
+        return json.loads(figure_json)
+
+    return wrapper
+
+
+def _stored_or_computed(key, function, args, kwargs, store: Optional[FigureStore]) -> bytes:
+    """Returns: the figure json from store, or computes the figure and stores it (store None: only computes it)"""
+
+    if store is None or store.directory is None:
+        return _to_json(function(*args, **kwargs))
+
+    figure_json = store.get(key)
+    if figure_json is not None:
+        return figure_json
+
+    # with a lock directory, only one process computes a figure, the others wait and then read it from the store
+    with single_flight.file_lock(key):
+        figure_json = store.get(key)
+        if figure_json is None:
+            figure_json = _to_json(function(*args, **kwargs))
+            store.put(key, figure_json)
+
+    return figure_json
+
+
+def _to_json(figure) -> bytes:
+    """Returns: the figure serialized as plotly json"""
+    with metrics.timer("figure_cache.to_json"):
+        return pio.to_json(figure, validate=False).encode()
+
+
+def _hashable(value):
+    """Returns: the value with lists as tuples (e.g. the value of a range slider), so it can be part of a key"""
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+
+    return value
@@ -0,0 +1,306 @@
+import argparse
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+from noc_to_region import noc_to_regions
+
+# Generator of synthetic data with the same schema as Data/athlete_events_anonymized.csv, for load testing.
+# The distributions follow the real dataset: athletes take part in one or more consecutive Games and in several events per Games,
+# team events give the same medal to every member of the team, about 85 % of the rows have no medal
+# and Age, Height and Weight are missing for some athletes. The share of women grows over the years.
+# The data is generated and written in chunks, so any number of rows can be written with bounded memory.
+# Usage: python generate_dataset.py --rows 10000000 --output Data/athlete_events_synthetic.csv
+
+COLUMNS = ["ID", "Name", "Sex", "Age", "Height", "Weight", "Team", "NOC", "Games", "Year", "Season", "City", "Sport", "Event", "Medal"]
+
+SUMMER_GAMES = [(1896, "Athina"), (1900, "Paris"), (1904, "St. Louis"), (1906, "Athina"), (1908, "London"), (1912, "Stockholm"),
+                (1920, "Antwerpen"), (1924, "Paris"), (1928, "Amsterdam"), (1932, "Los Angeles"), (1936, "Berlin"), (1948, "London"),
+                (1952, "Helsinki"), (1956, "Melbourne"), (1960, "Roma"), (1964, "Tokyo"), (1968, "Mexico City"), (1972, "Munich"),
+                (1976, "Montreal"), (1980, "Moskva"), (1984, "Los Angeles"), (1988, "Seoul"), (1992, "Barcelona"), (1996, "Atlanta"),
+                (2000, "Sydney"), (2004, "Athina"), (2008, "Beijing"), (2012, "London"), (2016, "Rio de Janeiro")]
+WINTER_GAMES = [(1924, "Chamonix"), (1928, "Sankt Moritz"), (1932, "Lake Placid"), (1936, "Garmisch-Partenkirchen"), (1948, "Sankt Moritz"),
+                (1952, "Oslo"), (1956, "Cortina d'Ampezzo"), (1960, "Squaw Valley"), (1964, "Innsbruck"), (1968, "Grenoble"),
+                (1972, "Sapporo"), (1976, "Innsbruck"), (1980, "Lake Placid"), (1984, "Sarajevo"), (1988, "Calgary"),
+                (1992, "Albertville"), (1994, "Lillehammer"), (1998, "Nagano"), (2002, "Salt Lake City"), (2006, "Torino"),
+                (2010, "Vancouver"), (2014, "Sochi")]
+
+RUNNING_DISTANCES = ["100 metres", "200 metres", "400 metres", "800 metres", "1,500 metres", "5,000 metres", "10,000 metres", "Marathon"]
+
+# sport: (season, team size (0 = individual sport), relative number of athletes, mean age, height offset, events for men, events for women)
+# an int instead of a list of events means that many generic events
+SPORTS = {
+    "Athletics": ("Summer", 0, 16, 25, 0, RUNNING_DISTANCES + ["60 metres", "High Jump", "Long Jump", "Shot Put", "Javelin Throw", "Decathlon"],
+                RUNNING_DISTANCES + ["3,000 metres", "High Jump", "Long Jump", "Shot Put", "Javelin Throw", "Heptathlon"]),
+    "Swimming": ("Summer", 0, 9, 21, 4, 16, 14),
+    "Gymnastics": ("Summer", 0, 10, 22, -10, ["Individual All-Around", "Floor Exercise", "Horse Vault", "Parallel Bars", "Horizontal Bar", "Rings", "Pommelled Horse"],
+                ["Individual All-Around", "Floor Exercise", "Horse Vault", "Uneven Bars", "Balance Beam"]),
+    "Rhythmic Gymnastics": ("Summer", 0, 1, 19, -6, [], ["Individual"]),
+    "Rowing": ("Summer", 0, 4, 25, 8, 8, 6),
+    "Cycling": ("Summer", 0, 4, 25, 0, 10, 6),
+    "Fencing": ("Summer", 0, 4, 26, 2, 6, 4),
+    "Wrestling": ("Summer", 0, 3, 25, -2, 10, 4),
+    "Boxing": ("Summer", 0, 3, 24, -2, 10, 3),
+    "Shooting": ("Summer", 0, 4, 33, 0, 9, 6),
+    "Sailing": ("Summer", 0, 3, 29, 0, 6, 4),
+    "Canoeing": ("Summer", 0, 3, 25, 2, 8, 5),
+    "Weightlifting": ("Summer", 0, 2, 25, -6, 8, 7),
+    "Equestrianism": ("Summer", 0, 2, 32, 0, 4, 3),
+    "Judo": ("Summer", 0, 2, 25, 0, 7, 7),
+    "Diving": ("Summer", 0, 1, 22, -4, 4, 4),
+    "Archery": ("Summer", 0, 1, 27, 0, 2, 2),
+    "Tennis": ("Summer", 0, 1, 25, 2, 2, 2),
+    "Table Tennis": ("Summer", 0, 1, 26, 0, 2, 2),
+    "Badminton": ("Summer", 0, 1, 25, 0, 2, 2),
+    "Modern Pentathlon": ("Summer", 0, 1, 26, 0, 1, 1),
+    "Basketball": ("Summer", 12, 3, 25, 14, ["Basketball"], ["Basketball"]),
+    "Football": ("Summer", 18, 4, 24, 0, ["Football"], ["Football"]),
+    "Hockey": ("Summer", 16, 3, 25, 0, ["Hockey"], ["Hockey"]),
+    "Handball": ("Summer", 14, 2, 25, 8, ["Handball"], ["Handball"]),
+    "Volleyball": ("Summer", 12, 2, 25, 12, ["Volleyball"], ["Volleyball"]),
+    "Water Polo": ("Summer", 13, 2, 25, 6, ["Water Polo"], ["Water Polo"]),
+    "Alpine Skiing": ("Winter", 0, 4, 23, 0, ["Downhill", "Super G", "Giant Slalom", "Slalom", "Combined"],
+                ["Downhill", "Super G", "Giant Slalom", "Slalom", "Combined"]),
+    "Cross Country Skiing": ("Winter", 0, 3, 26, 0, 6, 6),
+    "Speed Skating": ("Winter", 0, 3, 24, 0, 6, 6),
+    "Biathlon": ("Winter", 0, 2, 26, 0, 5, 5),
+    "Figure Skating": ("Winter", 0, 1, 22, -6, 2, 2),
+    "Ski Jumping": ("Winter", 0, 1, 23, 0, 2, 1),
+    "Luge": ("Winter", 0, 1, 25, 0, 2, 1),
+    "Ice Hockey": ("Winter", 22, 3, 26, 4, ["Ice Hockey"], ["Ice Hockey"]),
+    "Bobsleigh": ("Winter", 4, 1, 28, 4, ["Four"], ["Two"]),
+    "Curling": ("Winter", 5, 1, 33, 0, ["Curling"], ["Curling"]),
+}
+
+# probability of no value per athlete, and of a medal per individual row or per team
+MISSING_AGE, MISSING_HEIGHT, MISSING_WEIGHT = 0.035, 0.22, 0.23
+INDIVIDUAL_MEDAL, TEAM_MEDAL = 0.14, 0.2
+
+
+class Universe:
+    """The Games, sports, events and NOCs that the synthetic rows are drawn from."""
+
+    def __init__(self) -> None:
+        games = [(year, "Summer", city) for year, city in SUMMER_GAMES] + [(year, "Winter", city) for year, city in WINTER_GAMES]
+        self.games = pd.DataFrame(games, columns=["Year", "Season", "City"])
+        self.games["Games"] = self.games["Year"].astype(str) + " " + self.games["Season"]
+        self.season_games = {season: np.flatnonzero(self.games["Season"].to_numpy() == season) for season in ["Summer", "Winter"]}
+
+        # share of women per Games, from almost none in 1896 to 45 % in 2016
+        self.female_share = np.clip((self.games["Year"].to_numpy() - 1896) / 120 * 0.45, 0.0, 0.45)
+
+        self.sports = list(SPORTS)
+        self.sport_season = np.array([SPORTS[sport][0] for sport in self.sports])
+        self.team_size = np.array([SPORTS[sport][1] for sport in self.sports])
+        self.sport_weight = np.array([SPORTS[sport][2] for sport in self.sports], dtype=float)
+        self.mean_age = np.array([SPORTS[sport][3] for sport in self.sports], dtype=float)
+        self.height_offset = np.array([SPORTS[sport][4] for sport in self.sports], dtype=float)
+
+        # events, with the range of event numbers for every sport (rows) and sex (columns, M and F)
+        self.events = []
+        self.event_start = np.zeros((len(self.sports), 2), dtype=np.int64)
+        self.event_count = np.zeros((len(self.sports), 2), dtype=np.int64)
+        for sport_index, sport in enumerate(self.sports):
+            for sex_index, (events, prefix) in enumerate([(SPORTS[sport][5], "Men's"), (SPORTS[sport][6], "Women's")]):
+                if isinstance(events, int):
+                    events = [f"Event {number}" for number in range(1, events + 1)]
+                self.event_start[sport_index, sex_index] = len(self.events)
+                self.event_count[sport_index, sex_index] = len(events)
+                self.events += [f"{sport} {prefix} {event}" for event in events]
+        self.events = np.array(self.events, dtype=object)
+
+        # NOCs with a long tail, a few large teams (USA largest) and many small ones
+        nocs = pd.read_csv("Data/noc_regions.csv")["NOC"].to_numpy(dtype=object)
+        rank = np.random.default_rng(0).permutation(len(nocs)) + 2.0
+        rank[nocs == "USA"] = 1.0
+        self.nocs = nocs
+        self.teams = noc_to_regions(nocs)
+        self.noc_weight = 1 / rank ** 0.7
+        self.noc_weight /= self.noc_weight.sum()
+
+
+def generate_chunk(rng: np.random.Generator, universe: Universe, first_id: int, athletes: int) -> tuple:
+    """
+    Generates the rows for about a number of new athletes (IDs from first_id), 85 % in individual sports and 15 % in teams.
+
+    Returns
+    -------
+    chunk : pd.DataFrame
+        Columns: ID, Name, Sex, Age, Height, Weight, Team, NOC, Games, Year, Season, City, Sport, Event and Medal (sorted by ID).
+    next_id : int
+        The first ID that was not used.
+    """
+
+    team_sports = np.flatnonzero(universe.team_size > 0)
+    individual_sports = np.flatnonzero(universe.team_size == 0)
+
+    # individual athletes: one row per athlete, Games and event
+    n_individual = int(athletes * 0.85)
+    sport = rng.choice(individual_sports, n_individual, p=_normalized(universe.sport_weight[individual_sports]))
+    individual = _athletes(rng, universe, first_id, sport)
+    individual = individual.loc[individual.index.repeat(individual["n_games"])]
+    individual["games"] += individual.groupby(level=0).cumcount().to_numpy()
+    individual = individual.reset_index(drop=True)
+    individual = individual.loc[individual.index.repeat(np.minimum(rng.geometric(0.6, len(individual)), 5))].reset_index(drop=True)
+    individual["event"] = _pick_events(rng, universe, individual["sport"].to_numpy(), individual["sex"].to_numpy())
+    individual["medal"] = _medals(rng, len(individual), INDIVIDUAL_MEDAL)
+    individual = individual.drop_duplicates(subset=["ID", "games", "event"])
+
+    # teams: every member has a row for each Games the team takes part in, with the same event and medal
+    n_teams = max(int(athletes * 0.15 / universe.team_size[team_sports].mean()), 1)
+    team_sport = rng.choice(team_sports, n_teams, p=_normalized(universe.sport_weight[team_sports]))
+    team_id = np.repeat(np.arange(n_teams), universe.team_size[team_sport])
+    # the whole team has the same NOC, sex, Games and event
+    teams = _athletes(rng, universe, 0, team_sport)
+    members = _athletes(rng, universe, first_id + n_individual, team_sport[team_id], teams.iloc[team_id])
+    members["team_id"] = team_id
+    team_event = _pick_events(rng, universe, team_sport, teams["sex"].to_numpy())
+    members = members.loc[members.index.repeat(members["n_games"])]
+    members["games"] += members.groupby(level=0).cumcount().to_numpy()
+    members = members.reset_index(drop=True)
+    members["event"] = team_event[members["team_id"].to_numpy()]
+    team_medal = pd.Series(_medals(rng, n_teams * len(universe.games), TEAM_MEDAL))
+    members["medal"] = team_medal.to_numpy()[members["team_id"].to_numpy() * len(universe.games) + members["games"].to_numpy()]
+
+    rows = pd.concat([individual, members.drop(columns=["team_id"])], ignore_index=True).sort_values("ID", kind="stable")
+
+    return _to_schema(universe, rows), first_id + n_individual + len(team_id)
+
+
+def _athletes(rng: np.random.Generator, universe: Universe, first_id: int, sport: np.ndarray, team: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Returns: one row per new athlete with ID, sport, sex, NOC, first Games, number of Games, birth year, height and weight
+    (NOC, sex and Games are taken from team, one row per athlete, if it is given)
+    """
+
+    n = len(sport)
+    season = universe.sport_season[sport]
+
+    # first Games, later Games have more athletes
+    games = np.empty(n, dtype=np.int64)
+    n_games = np.minimum(rng.geometric(0.55, n), 4)
+    for name, season_games in universe.season_games.items():
+        in_season = season == name
+        weight = _normalized(np.arange(1, len(season_games) + 1, dtype=float))
+        games[in_season] = rng.choice(season_games, in_season.sum(), p=weight)
+        # the Games an athlete takes part in are consecutive, within the season
+        position = np.searchsorted(season_games, games[in_season])
+        n_games[in_season] = np.minimum(n_games[in_season], len(season_games) - position)
+
+    # sex from the share of women at the first Games, sports without events for one sex only get the other
+    female = rng.random(n) < universe.female_share[games]
+    female = np.where(universe.event_count[sport, 0] == 0, True, np.where(universe.event_count[sport, 1] == 0, False, female))
+    noc = rng.choice(len(universe.nocs), n, p=universe.noc_weight)
+
+    if team is not None:
+        games, n_games, noc = team["games"].to_numpy(), team["n_games"].to_numpy(), team["NOC"].to_numpy()
+        female = team["sex"].to_numpy().astype(bool)
+
+    age = np.clip(rng.normal(universe.mean_age[sport], 4.0), 11, 70).round()
+    height = rng.normal(np.where(female, 168.0, 179.0) + universe.height_offset[sport], 7.0).round()
+    weight = (height - 100 - np.where(female, 8.0, 0.0) + rng.normal(0, 6.0, n)).round()
+
+    return pd.DataFrame(dict(ID=np.arange(first_id, first_id + n),
+                            sport=sport,
+                            sex=female.astype(np.int64),
+                            NOC=noc,
+                            games=games,
+                            n_games=n_games,
+                            birth_year=universe.games["Year"].to_numpy()[games] - age,
+                            height=np.where(rng.random(n) < MISSING_HEIGHT, np.nan, height),
+                            weight=np.where(rng.random(n) < MISSING_WEIGHT, np.nan, weight),
+                            age_missing=rng.random(n) < MISSING_AGE))
+
+
+def _pick_events(rng: np.random.Generator, universe: Universe, sport: np.ndarray, sex: np.ndarray) -> np.ndarray:
+    """Returns: a random event number for every sport and sex"""
+    return universe.event_start[sport, sex] + (rng.random(len(sport)) * universe.event_count[sport, sex]).astype(np.int64)
+
+
+def _medals(rng: np.random.Generator, n: int, probability: float) -> np.ndarray:
+    """Returns: medal codes (0=no medal, 1=Gold, 2=Silver, 3=Bronze) with a medal in probability of the cases"""
+    return np.where(rng.random(n) < probability, rng.integers(1, 4, n), 0)
+
+
+def _normalized(weights: np.ndarray) -> np.ndarray:
+    return weights / weights.sum()
+
+
+def _to_schema(universe: Universe, rows: pd.DataFrame) -> pd.DataFrame:
+    """Turns the generated codes into the columns of the dataset."""
+
+    games = universe.games.iloc[rows["games"].to_numpy()].reset_index(drop=True)
+    age = games["Year"].to_numpy() - rows["birth_year"].to_numpy()
+    medal = np.array([np.nan, "Gold", "Silver", "Bronze"], dtype=object)[rows["medal"].to_numpy()]
+    ids = rows["ID"].to_numpy()
+
+    # anonymized names, as in anonymize_os_data.py, hashed once per athlete
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    names = np.array([hashlib.sha256(f"Athlete {athlete}".encode()).hexdigest() for athlete in unique_ids], dtype=object)[inverse]
+
+    chunk = pd.DataFrame(dict(ID=ids,
+                            Name=names,
+                            Sex=np.array(["M", "F"], dtype=object)[rows["sex"].to_numpy()],
+                            Age=np.where(rows["age_missing"].to_numpy(), np.nan, age.astype(float)),
+                            Height=rows["height"].to_numpy(),
+                            Weight=rows["weight"].to_numpy(),
+                            Team=universe.teams[rows["NOC"].to_numpy()],
+                            NOC=universe.nocs[rows["NOC"].to_numpy()],
+                            Games=games["Games"].to_numpy(),
+                            Year=games["Year"].to_numpy(),
+                            Season=games["Season"].to_numpy(),
+                            City=games["City"].to_numpy(),
+                            Sport=np.array(universe.sports, dtype=object)[rows["sport"].to_numpy()],
+                            Event=universe.events[rows["event"].to_numpy()],
+                            Medal=medal), columns=COLUMNS)
+
+    # the USA did not take part in the 1980 summer games (the USA tab expects that)
+    return chunk[~((chunk["NOC"] == "USA") & (chunk["Games"] == "1980 Summer"))]
+
+
+def generate_dataset(path: str, rows: int, seed: int = 0, chunk_athletes: int = 100_000) -> int:
+    """
+    Generates a synthetic dataset and writes it to a csv file, one chunk at a time.
+
+    Parameters
+    ----------
+    path : str
+        The csv file to write.
+    rows : int
+        The number of rows to write.
+    seed : int
+        Seed for the random generator (the same seed gives the same data).
+    chunk_athletes : int
+        Number of athletes generated per chunk (default 100 000, about 250 000 rows).
+
+    Returns
+    -------
+    written : int
+        The number of rows written.
+    """
+
+    rng = np.random.default_rng(seed)
+    universe = Universe()
+    written, next_id = 0, 1
+
+    with open(path, "w", newline="") as file:
+        while written < rows:
+            chunk, next_id = generate_chunk(rng, universe, next_id, chunk_athletes)
+            chunk = chunk.iloc[:rows - written]
+            chunk.to_csv(file, header=written == 0, index=False)
+            written += len(chunk)
+
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates synthetic data with the schema of athlete_events_anonymized.csv.")
+    parser.add_argument("--rows", type=int, default=271116, help="number of rows (default the size of the real dataset)")
+    parser.add_argument("--output", default="Data/athlete_events_synthetic.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written = generate_dataset(args.output, args.rows, args.seed)
+    seconds = time.perf_counter() - start
+    print(f"{written} rows written to {args.output} in {seconds:.1f} s ({written / seconds:,.0f} rows/s)")
@@ -0,0 +1,45 @@
+import gc
+import os
+
+# Gunicorn settings (gunicorn reads ./gunicorn.conf.py by default, so the Procfile does not have to name it).
+# The app is loaded once in the master process and the dataset, SportStatistics and the aggregates are computed there,
+# before the workers are forked. The workers share these pages with the master (copy-on-write) instead of each
+# building its own copy, so the memory does not grow with the number of workers.
+# PRELOAD_APP=0 loads the app in every worker instead (the old behavior), measure_workers.py compares the two.
+# PREWARM_FIGURES=1 renders every dashboard figure into the persistent figure store before the workers start (see prewarm.py).
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+preload_app = os.environ.get("PRELOAD_APP", "1") != "0"
+
+# in static mode (see static_export.py) the figures are read from files, there is nothing to load or prewarm
+static_mode = bool(os.environ.get("STATIC_EXPORT_DIR"))
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before the workers are forked."""
+    if static_mode:
+        return
+
+    if os.environ.get("PREWARM_FIGURES") == "1":
+        import prewarm
+
+        stats = prewarm.prewarm()
+        server.log.info(f"Prewarmed {stats['figures']} figures in {stats['seconds']:.1f} s")
+
+    if not preload_app:
+        return
+
+    import load_data
+    import aggregates
+
+    # waits for the background loading started by index.py, so nothing is still loading when the workers are forked
+    load_data.get_sport_statistics()
+    for name in aggregates.AGGREGATES:
+        aggregates.load_aggregate(name)
+
+    # move everything that exists now out of the garbage collector's generations, otherwise the collector
+    # writes to every object it visits in a worker and the shared pages get copied
+    gc.collect()
+    gc.freeze()
+    server.log.info("Dataset and aggregates loaded before forking the workers")
@@ -8,6 +8,21 @@ import dash_bootstrap_components as dbc
 from app import app, server
 from layouts import usa_layout, sports_layout
 import callbacks
+import load_data
+import static_export
+
+# the dataset and SportStatistics are loaded in the background, so the server answers while they load
+# (in static mode the figures are read from the static export, no data is loaded)
+if not static_export.static_mode():
+    load_data.load_in_background()
+
+# readiness check for the load balancer: 200 when the sports data is loaded, 503 while it is still loading
+@server.route("/ready")
+def ready():
+    if static_export.static_mode() or load_data.sport_statistics_ready():
+        return {"ready": True}, 200
+
+    return {"ready": False}, 503
 
 # main layout
 app.layout = dbc.Container([
@@ -2,14 +2,48 @@ import dash_bootstrap_components as dbc
 import dash_daq as daq
 
 from dash import dcc, html
-from load_data import SportStatistics
-from noc_to_region import noc_to_region
+import aggregates
+import background
+import static_export
 
-# SportStatistics object
-sport_statistics = SportStatistics()
+# drop down meny for chosing sport (the sports come from the aggregates manifest, the data itself is loaded on first use)
+sport_options_dropdown = [{"label" : sport, "value" : sport} for sport in aggregates.sports()]
 
-# drop down meny for chosing sport
-sport_options_dropdown = [{"label" : sport, "value" : sport} for sport in sport_statistics.sports()]
+#YEAR SLIDERS
+
+#First and last year of the dataset, the sliders start at the full range
+year_range = aggregates.years()
+
+def year_slider(slider_id: str) -> dbc.Card:
+    """Returns: a card with a range slider for the years (disabled in static mode, only the full range is exported)"""
+
+    marks = {year : str(year) for year in range(year_range[0], year_range[1] + 1, 20)}
+    marks[year_range[1]] = str(year_range[1])
+
+    return dbc.Card(
+        dbc.CardBody([
+            html.H5("Years:"),
+            dcc.RangeSlider(
+                id=slider_id,
+                min=year_range[0],
+                max=year_range[1],
+                step=1,
+                marks=marks,
+                value=list(year_range),
+                allowCross=False,
+                tooltip={"placement" : "bottom"},
+                disabled=static_export.static_mode())
+            ]),
+        className="mt-4")
+
+#PROGRESS BARS
+
+def progress_bar(bar_id: str) -> list:
+    """Returns: the progress bar of a background job above a graph (hidden while no job runs), nothing when background callbacks are off"""
+    if not background.enabled():
+        return []
+
+    return [dbc.Progress(id=bar_id, value=0, striped=True, animated=True, className="mb-3", style={"display" : "none"})]
 
 #USA LAYOUT
 
@@ -75,15 +109,27 @@ usa_layout = html.Div([
                 )],
                 className="mt-4"
             ),
+            year_slider("usa-years"),
             dbc.Card(
                 dbc.CardBody(
-                    dcc.Graph(id="usa-graph")
+                    progress_bar("usa-progress") + [dcc.Graph(id="usa-graph")]
                     ),
             className="mt-4" ) 
         ])
 
 # SPORTS LAYOUT
 
+# gender selection card, hidden (by a clientside callback) for the gender distribution
+gender_selection = dbc.Card(
+dbc.CardBody([
+    html.H5("Select gender:", className="pb-2"),
+    dcc.RadioItems(id='gender-selection',
+                    options=[{"label" : gender, "value" : gender.strip(" ").lower()} for gender in [" Both", " Male", " Female"]],
+                    value="both")
+    ]),
+    style={"height": "100%"}
+)
+
 sports_layout = html.Div([
     dcc.Store(id="sports-data"),
     dbc.Row([
@@ -114,30 +160,18 @@ sports_layout = html.Div([
             md=5
         ),
         dbc.Col(
+            gender_selection,
             id="third-box",
             xl=3,
             md=4
         )
     ],
         className="mt-4"),
+    year_slider("sports-years"),
     dbc.Card(
         dbc.CardBody(
-            dcc.Graph(id="sports-graph")
+            progress_bar("sports-progress") + [dcc.Graph(id="sports-graph")]
         ),
         className="mt-4"
     )
 ])
-
-# gender selection card, is not showed all the time
-gender_selection = dbc.Card(
-dbc.CardBody([
-    html.H5("Select gender:", className="pb-2"),
-    dcc.RadioItems(id='gender-selection',
-                    options=[{"label" : gender, "value" : gender.strip(" ").lower()} for gender in [" Both", " Male", " Female"]],
-                    value="both")
-    ]),
-    style={"height": "100%"}
-)
-
-# callback breaks if this doesnt exist
-hidden_gender_selection = dbc.RadioItems(id='gender-selection', value="both")
\ No newline at end of file
@@ -1,24 +1,195 @@
-from typing import List
+from typing import List, Optional, Tuple, Union
+import threading
+import numpy as np
 import pandas as pd
 from pandas.core.frame import DataFrame
-from unique_medals import unique_medals
+import columnar_cache
+from medal_cube import Cube, OlympicCube, PrefixSums
+from metrics import timed
+from noc_to_region import noc_to_regions
+
+WORLD_DATA_PATH = "Data/athlete_events_anonymized.csv"
+MEDAL_TYPES = ["Gold", "Silver", "Bronze"]
+
+#Compact types for the dataset: the string columns (also Name, which repeats for every event an athlete takes part in)
+#are dictionary encoded as categoricals and the numbers use the narrowest type that holds them
+WORLD_DATA_SCHEMA = dict(ID="int32", Name="category", Sex="category", Age="float32", Height="float32", Weight="float32",
+                        Team="category", NOC="category", Games="category", Year="int16", Season="category", City="category",
+                        Sport="category", Event="category", Medal="category")
+
+#SHARED DATASET CACHE
+
+#The full dataset is only parsed once per process and then shared by every import function and SportStatistics
+_world_data = None
+_dataset_version = None
+_world_data_lock = threading.Lock()
+
+#Partition index of the shared dataset: (dataset, row positions sorted by NOC, {NOC: (start, stop)})
+_country_index = None
+
+#Used in column names instead of the NOC code
+_DEMONYMS = dict(USA="American")
+
+
+@timed
+def reload_world_data() -> pd.DataFrame:
+    """
+    Loads the data file again and replaces the shared dataset (use when the data file has changed).
+    
+    Returns
+    -------
+    pd.DataFrame
+        The new shared dataset.
+    """
+
+    with _world_data_lock:
+        _load_world_data()
+        return _world_data
+
+
+def clear_world_data_cache() -> None:
+    """Drops the shared dataset, so that the data file is loaded again on the next import."""
+
+    global _world_data, _dataset_version, _country_index
+
+    with _world_data_lock:
+        _world_data = None
+        _dataset_version = None
+        _country_index = None
+
+
+def set_world_data(world_data: pd.DataFrame, version: str) -> None:
+    """
+    Replaces the shared dataset with a dataframe that is not read from the data file (e.g. a scaled dataset in benchmark.py).
+
+    Parameters
+    ----------
+    world_data : pd.DataFrame
+        The new shared dataset, with the same columns as import_world_data returns.
+    version : str
+        A version string for the dataframe, used by the caches instead of the sha256 of the data file.
+    """
+
+    global _world_data, _dataset_version, _country_index
+
+    with _world_data_lock:
+        _world_data = world_data
+        _dataset_version = version
+        _country_index = None
+
+
+def dataset_version() -> str:
+    """Returns: the sha256 of the data file behind the shared dataset (the same in every process using the same file)"""
+    version = _dataset_version
+    if version is None:
+        version = columnar_cache.ensure_cache(WORLD_DATA_PATH)["sha256"]
+
+    return version
+
 
 #FULL DATASETS
 
-def import_world_data() -> pd.DataFrame: 
+@timed
+def import_world_data(columns: Optional[List[str]] = None) -> pd.DataFrame: 
     """
-    Imports and returns the full dataset.
+    Returns the full dataset.
+    The data is loaded from the columnar cache (see columnar_cache.py) on the first call, after that the same dataframe is returned to every caller. 
+    The dataframe is shared and must be treated as read-only (filter it or use .copy() before changing it).
+
+    Parameters
+    ----------
+    columns : list
+        Only return these columns (default all columns). 
+        If the shared dataset has not been loaded yet, only these columns are read from the cache (unless Region is one of them).
     
     Returns
     -------
     pd.DataFrame
         Columns: ID, Name, Sex, Age, Height, Weight, Team, NOC, 
-                Games, Year, Season, City, Sport, Event and Medal. 
+                Games, Year, Season, City, Sport, Event, Medal and Region. 
+        The types are given by WORLD_DATA_SCHEMA (the string columns are categoricals, group them with observed=True).
+    """
+
+    world_data = _world_data
+    if world_data is None:
+        #Region is not in the data file, it is added when the shared dataset is loaded
+        if columns is not None and "Region" not in columns:
+            return columnar_cache.read_table(WORLD_DATA_PATH, columns, dtypes=WORLD_DATA_SCHEMA)
+
+        with _world_data_lock:
+            #Another thread might have loaded the data while this one was waiting for the lock
+            if _world_data is None:
+                _load_world_data()
+            world_data = _world_data
+
+    if columns is not None:
+        return world_data[columns]
+
+    return world_data
+
+
+def _load_world_data() -> None:
+    """Loads the data file into the shared dataset (the caller must hold _world_data_lock)."""
+
+    global _world_data, _dataset_version, _country_index
+    _dataset_version = columnar_cache.ensure_cache(WORLD_DATA_PATH)["sha256"]
+    world_data = columnar_cache.read_table(WORLD_DATA_PATH, dtypes=WORLD_DATA_SCHEMA)
+
+    #Join the region once, as a categorical column, so grouping by region costs nothing later
+    world_data["Region"] = pd.Categorical(noc_to_regions(world_data["NOC"]))
+
+    _world_data = world_data
+    _country_index = None
+
+
+def _build_country_index(world_data: pd.DataFrame) -> tuple:
+    """
+    Creates the partition index of a dataset: the row positions sorted by NOC (stable, so the original order is kept within a country) 
+    and the range of positions for each NOC.
+    """
+
+    codes, nocs = pd.factorize(world_data["NOC"], sort=True)
+    rows = np.argsort(codes, kind="stable")
+    starts = np.searchsorted(codes[rows], np.arange(len(nocs) + 1))
+    partitions = {noc: (starts[index], starts[index + 1]) for index, noc in enumerate(nocs)}
+
+    return world_data, rows, partitions
+
+
+@timed
+def import_full_data_country(noc: str) -> pd.DataFrame:
     """
+    Creates a dataframe that exclusively contains data from one country.
+    The rows are picked from a partition index that is built once per dataset, so no scan of the full dataset is needed.
+
+    Parameters
+    ----------
+    noc : str
+        The NOC code of the country, e.g. USA or SWE.
     
-    return pd.read_csv("Data/athlete_events_anonymized.csv")
+    Returns
+    -------
+    country_data : pd.DataFrame
+        Columns: ID, Name, Sex, Age, Height, Weight, Team, NOC, 
+                Games, Year, Season, City, Sport, Event, Medal and Region. 
+        The rows are in the same order as in the full dataset (empty if the NOC is not in the dataset).
+    """
+
+    global _country_index
+
+    world_data = import_world_data()
+    country_index = _country_index
+    if country_index is None or country_index[0] is not world_data:
+        country_index = _country_index = _build_country_index(world_data)
+
+    _, rows, partitions = country_index
+    start, stop = partitions.get(noc, (0, 0))
+    country_data = world_data.take(rows[start:stop]).reset_index(drop=True)
+
+    return country_data
 
 
+@timed
 def import_full_data_usa() -> pd.DataFrame:
     """
     Creates a dataframe that exclusively contains data from the US.
@@ -27,109 +198,184 @@ def import_full_data_usa() -> pd.DataFrame:
     -------
     usa_data : pd.DataFrame
         Columns: ID, Name, Sex, Age, Height, Weight, Team, NOC, 
-                Games, Year, Season, City, Sport, Event and Medal. 
+                Games, Year, Season, City, Sport, Event, Medal and Region. 
     """
 
-    usa_data = import_world_data()
-    usa_data = usa_data[usa_data["NOC"] == "USA"].reset_index(drop=True)
+    usa_data = import_full_data_country("USA")
     
     return usa_data 
 
 
 #MEDALS DATA
 
-def import_medals_won() -> pd.DataFrame: 
+@timed
+def import_medals_won(noc: str = "USA") -> pd.DataFrame: 
     """
-    Creates a dataframe, which contains only the winnings for the US.
+    Creates a dataframe, which contains only the winnings for a country (default the US).
     Since team winnings are counted per participants in the original dataset, 
     the function only returns the rows that are unique across event, games and medal.
-    (However in the cases where there is a tie between two Americans, this will still not give the correct result.)
+    (However in the cases where there is a tie between two athletes from the country, this will still not give the correct result.)
+
+    Parameters
+    ----------
+    noc : str
+        The NOC code of the country (default USA).
     
     Returns
     -------
     medals : pd.DataFrame
-        Columns: ID, Name, Sex, Age, Height, Weight, Team, NOC, Games, Year, Season, City, Sport, Event and Medal.
-        The dataframe contains only the winnings for the US. 
+        Columns: ID, Name, Sex, Age, Height, Weight, Team, NOC, Games, Year, Season, City, Sport, Event, Medal and Region.
+        The dataframe contains only the winnings for the country. 
     """
 
-    usa_data = import_full_data_usa()
-    medals = usa_data.dropna(subset=["Medal"])
+    country_data = import_full_data_country(noc)
+    medals = country_data.dropna(subset=["Medal"])
     medals = medals.drop_duplicates(subset=["Event", "Games", "Medal"]).reset_index(drop=True)
 
     return medals
 
 
-def import_medals_count() -> pd.DataFrame:
+def _insert_year_and_season(data: pd.DataFrame) -> None:
+    """Inserts the Year and Season of the Games column as the first two columns (also when there are no rows, e.g. for a NOC without data)."""
+
+    year_season = data["Games"].str.split(" ", n = 1, expand = True).reindex(columns=[0, 1]) #Splits each string in the Games column into two columns. Reference: https://www.geeksforgeeks.org/python-pandas-split-strings-into-two-list-columns-using-str-split/
+    data.insert(0, "Year", year_season[0])
+    data.insert(1, "Season", year_season[1].astype(data["Games"].dtype))
+    data["Year"] = data["Year"].astype(int)
+
+
+@timed
+def import_medals_count(noc: str = "USA") -> pd.DataFrame:
     """
     Creates a dataframe with information about the number of medals for each Olympic Game.
 
+    Parameters
+    ----------
+    noc : str
+        The NOC code of the country (default USA).
+
     Returns
     -------
     medals_merged_data : pd.DataFrame
-        Columns: Year, Season, Games, Medals USA, Medals total and Percentage of Medals.
+        Columns: Year, Season, Games, Medals <noc> (e.g. Medals USA), Medals total and Percentage of Medals.
     """
 
-    #Creates dataframes
-    #Only include the rows where there are medals and do not include team sports
-    sport_data = import_world_data().dropna(subset=["Medal"]).drop_duplicates(subset=["NOC", "Event", "Games", "Medal"])
-    medals_usa = import_medals_won()
+    #The medals cube counts a team medal once per country, event, games and medal
+    medals = get_cube().medals
 
-    #Counting the medals for USA for each Olympic Game and creating a new dataframe
-    medals_usa = pd.DataFrame({"Medals USA": medals_usa["Medal"].groupby(medals_usa["Games"]).count()}).reset_index()
-    year_season = medals_usa["Games"].str.split(" ", n = 1, expand = True) #Splits each string in the Games column into two columns. Reference: https://www.geeksforgeeks.org/python-pandas-split-strings-into-two-list-columns-using-str-split/
-    medals_usa.insert(0, "Year", year_season[0])
-    medals_usa.insert(1, "Season", year_season[1])
-    medals_usa["Year"] = medals_usa["Year"].astype(int)
+    #Counting the medals for the country for each Olympic Game and creating a new dataframe
+    medals_column = f"Medals {noc}"
+    medals_country = pd.DataFrame({medals_column: medals.select(NOC=noc).sum("Games")}).reset_index()
+    _insert_year_and_season(medals_country)
 
     #Counting the total number of medals for each Olympic Game and creating a dataframe
-    medals_total = pd.DataFrame({"Medals total": sport_data["Medal"].groupby(sport_data["Games"]).count()})
+    medals_total = pd.DataFrame({"Medals total": medals.sum("Games")})
         
-    #Merge the data (USA did not take part in the summer games of 1980, so this will not be included)
-    medals_merged_data = pd.merge(medals_usa, medals_total, on="Games", how="left")
+    #Merge the data (Games where the country did not win any medals, e.g. the summer games of 1980 for USA, will not be included)
+    medals_merged_data = pd.merge(medals_country, medals_total, on="Games", how="left")
 
-    #Add a column with the percentage of medals won by the US
-    medals_merged_data["Percentage of Medals"] = (medals_merged_data["Medals USA"]/medals_merged_data["Medals total"])*100
+    #Add a column with the percentage of medals won by the country
+    medals_merged_data["Percentage of Medals"] = (medals_merged_data[medals_column]/medals_merged_data["Medals total"])*100
 
-    return medals_merged_data
+    #The merges put the columns in another order when the country has no medals
+    return medals_merged_data[["Year", "Season", "Games", medals_column, "Medals total", "Percentage of Medals"]]
 
 
-def import_medals_per_sport_and_event() -> list:
+@timed
+def medal_breakdown(by: Union[str, List[str]], **filters) -> pd.DataFrame:
     """
-    Creates two dataframes (sport and event) with the number of medals for the US.
+    Counts the total number of medals and the number of gold, silver and bronze medals per group, in one pass over the medal cube.
+
+    Parameters
+    ----------
+    by : str or list
+        The dimension(s) of the medal cube to group by: "Year", "Games", "NOC", "Sport", "Event" or "Sex", e.g. "Sport" or ["NOC", "Sex"].
+    **filters
+        Only count the medals that match every filter, dimension=label or dimension=list of labels (e.g. NOC="USA", Year=[2012, 2016]).
 
     Returns
     -------
-    sport_and_event_data : list
-        The returned list consists of two pd.DataFrames (first=Sport, second=Event).
-        Columns: Sport or Event, Total medals, Gold, Silver and Bronze
+    breakdown : pd.DataFrame
+        One row per group with medals (sorted by the group labels, medals with a missing group value are left out).
+        Columns: the group column(s), Total medals, Gold, Silver and Bronze.
     """
 
-    #Import the data
-    medals = import_medals_won()
+    by = [by] if isinstance(by, str) else list(by)
 
-    sport_and_event_data = []
+    counts = get_cube().medals.select(**filters).sum(by + ["Medal"])
+    #One column per medal type, also for medal types (or groups) without any medals
+    table = counts.unstack("Medal", fill_value=0) if len(counts) else pd.DataFrame(index=counts.index.droplevel("Medal"))
+    table = table.reindex(columns=MEDAL_TYPES, fill_value=0).astype(np.int64)
 
-    for game in ["Sport", "Event"]:
+    breakdown = table.reset_index()
+    breakdown.columns.name = None
+    breakdown.insert(len(by), "Total medals", table.sum(axis=1).to_numpy())
 
-        #Count the number of total, gold, silver and bronze medals per sport
-        number_medals = pd.DataFrame({"Total medals": medals["Medal"].groupby(medals[game]).count()}).reset_index()
-        number_gold = pd.DataFrame({"Gold": medals["Medal"][medals["Medal"] == "Gold"].groupby(medals[game]).count()}).reset_index()
-        number_silver = pd.DataFrame({"Silver": medals["Medal"][medals["Medal"] == "Silver"].groupby(medals[game]).count()}).reset_index()
-        number_bronze = pd.DataFrame({"Bronze": medals["Medal"][medals["Medal"] == "Bronze"].groupby(medals[game]).count()}).reset_index()
-        
-        #Merge the data
-        number_medals = pd.merge(number_medals, number_gold, on=game, how="outer")
-        number_medals = pd.merge(number_medals, number_silver, on=game, how="outer")
-        number_medals = pd.merge(number_medals, number_bronze, on=game, how="outer")
+    return breakdown
 
-        sport_and_event_data.append(number_medals)
+
+def _medal_table(prefix_sums: PrefixSums, years: Optional[Tuple[int, int]]) -> pd.DataFrame:
+    """
+    Returns: the medals of the prefix sums (by [Sport or Event, Medal]) in the year window,
+    one row per Sport or Event with medals, with the columns Total medals, Gold, Silver and Bronze
+    """
+
+    by = prefix_sums.by[0]
+    counts = prefix_sums.window(years)[:-1]
+    medal_labels = list(prefix_sums.labels["Medal"])
+    medal_counts = {medal: counts[:, medal_labels.index(medal)] if medal in medal_labels else np.zeros(len(counts), dtype=np.int64)
+                    for medal in MEDAL_TYPES}
+    total = sum(medal_counts.values())
+
+    #Only the sports or events with medals in the window
+    won = total > 0
+    table = pd.DataFrame({by: prefix_sums.labels[by][won]})
+    table["Total medals"] = total[won]
+    for medal in MEDAL_TYPES:
+        table[medal] = medal_counts[medal][won]
+
+    return table
+
+
+@timed
+def import_medals_per_sport_and_event(noc: str = "USA", years: Optional[Tuple[int, int]] = None) -> list:
+    """
+    Creates two dataframes (sport and event) with the number of medals for a country (default the US).
+
+    Parameters
+    ----------
+    noc : str
+        The NOC code of the country (default USA).
+    years : tuple
+        Only count the medals from the first to the last year (inclusive, default all years).
+
+    Returns
+    -------
+    sport_and_event_data : list
+        The returned list consists of two pd.DataFrames (first=Sport, second=Event).
+        Columns: Sport or Event, Total medals, Gold, Silver and Bronze
+    """
+
+    #The medals of the country per year in the medals cube, cumulated so that any year window is one subtraction
+    cube = get_cube()
+
+    #Count the number of total, gold, silver and bronze medals per sport and per event
+    sport_and_event_data = [_medal_table(cube.prefix_sums("medals", [game, "Medal"], NOC=noc), years) for game in ["Sport", "Event"]]
     
     return sport_and_event_data
 
 
-def import_top_ten_sports_and_events_all_medal_types() -> list:
+@timed
+def import_top_ten_sports_and_events_all_medal_types(noc: str = "USA", years: Optional[Tuple[int, int]] = None) -> list:
     """
-    Picks out the top ten sports and events for total, gold, silver and bronze medals.
+    Picks out the top ten sports and events for total, gold, silver and bronze medals for a country (default the US).
+
+    Parameters
+    ----------
+    noc : str
+        The NOC code of the country (default USA).
+    years : tuple
+        Only count the medals from the first to the last year (inclusive, default all years).
     
     Returns
     -------
@@ -140,181 +386,321 @@ def import_top_ten_sports_and_events_all_medal_types() -> list:
     """
 
     #Import the data
-    sport_medals, event_medals = import_medals_per_sport_and_event()
+    sport_medals, event_medals = import_medals_per_sport_and_event(noc, years)
 
     sport_event_all_medals_data = []
 
     for df in [sport_medals, event_medals]:
 
-        #Sort the medals 
-        top_ten_total = df.sort_values(by="Total medals", ascending=False).reset_index(drop=True).head(10)
-        top_ten_gold = df.sort_values(by="Gold", ascending=False).reset_index(drop=True).head(10)
-        top_ten_silver = df.sort_values(by="Silver", ascending=False).reset_index(drop=True).head(10)
-        top_ten_bronze = df.sort_values(by="Bronze", ascending=False).reset_index(drop=True).head(10)
+        #Pick the ten largest without sorting the whole dataframe
+        top_ten = [df.nlargest(10, column).reset_index(drop=True) for column in ["Total medals"] + MEDAL_TYPES]
 
-        sport_event_all_medals_data.append([top_ten_total, top_ten_gold, top_ten_silver, top_ten_bronze])
+        sport_event_all_medals_data.append(top_ten)
     
     return sport_event_all_medals_data 
 
 
 #PARTICIPANTS (INCLUDING GENDER) DATA
 
-def import_participants_data() -> pd.DataFrame:
+@timed
+def import_participants_data(noc: str = "USA") -> pd.DataFrame:
     """
-    Creates a dataframe with information about participants (number and gender) for US and the world.
+    Creates a dataframe with information about participants (number and gender) for a country (default the US) and the world.
     The participants are only counted once per Olympic Games (even though they participated in several events).
+
+    Parameters
+    ----------
+    noc : str
+        The NOC code of the country (default USA).
     
     Returns
     -------
     participants_data : pd.DataFrame
-        A dataframe with information about participants (number and gender) for US and the world.
-        Columns: Year, Season, Games, Participants from USA, Total Number of Participants, 
+        A dataframe with information about participants (number and gender) for the country and the world.
+        Columns (shown for USA, other countries have their NOC code instead of USA/American): 
+                Year, Season, Games, Participants from USA, Total Number of Participants, 
                 American Participants (%), Number of Males from USA, Number of Females from USA, 
                 Total Number Males, Total Number Females, Female Participants from USA (%), 
                 Male Participants from USA (%), World Female Participants (%), World Male Participants (%)
     """
 
-    #Import the data
-    usa_data = import_full_data_usa()
-    world_data = import_world_data()
+    #The participants cubes count every person once per Olympic Game (even though they participated in several events)
+    cube = get_cube()
+    country = cube.participants.select(NOC=noc)
+    world = cube.world_participants
 
-    #Removes people who participate in several events (the ID:s should be unique for each Olympic Game).
-    usa_data_unique_ID = usa_data.drop_duplicates(subset=["Games", "ID"])
-    world_data_unique_ID = world_data.drop_duplicates(subset=["Games", "ID"])
+    #Column names for the country
+    participants_column = f"Participants from {noc}"
+    males_column, females_column = f"Number of Males from {noc}", f"Number of Females from {noc}"
 
-    #Creates two dataframes for the participants and count the number of people for each olympic game and then merge them
-    usa_participants = pd.DataFrame({"Participants from USA" : usa_data_unique_ID["ID"].groupby(usa_data_unique_ID["Games"]).count()}).reset_index()
-    world_participants = pd.DataFrame({"Total Number of Participants" : world_data_unique_ID["ID"].groupby(world_data_unique_ID["Games"]).count()}).reset_index()
-    participants_data = pd.merge(usa_participants, world_participants, on="Games", how="left")
+    #Creates two dataframes for the participants with the number of people for each olympic game and then merge them
+    country_participants = pd.DataFrame({participants_column : country.sum("Games")}).reset_index()
+    world_participants = pd.DataFrame({"Total Number of Participants" : world.sum("Games")}).reset_index()
+    participants_data = pd.merge(country_participants, world_participants, on="Games", how="left")
 
     #Split the Games column into two and create Year and Season 
-    year_season = participants_data["Games"].str.split(" ", n = 1, expand = True) #Splits each string in the Games column into two columns. Reference: https://www.geeksforgeeks.org/python-pandas-split-strings-into-two-list-columns-using-str-split/
-    participants_data.insert(0, "Year", year_season[0])
-    participants_data.insert(1, "Season", year_season[1])
-    participants_data["Year"] = participants_data["Year"].astype(int)
+    _insert_year_and_season(participants_data)
 
-    #Calculates the percentage of American participants for each game
-    participants_data["American Participants (%)"] = ((participants_data["Participants from USA"]/participants_data["Total Number of Participants"])*100).round(1)
+    #Calculates the percentage of participants from the country for each game
+    percentage_column = f"{_DEMONYMS.get(noc, noc)} Participants (%)"
+    participants_data[percentage_column] = ((participants_data[participants_column]/participants_data["Total Number of Participants"])*100).round(1)
 
-    #Creates gender data for the US and the world
-    gender_usa = pd.DataFrame({"Number of Males from USA":usa_data_unique_ID["Sex"][usa_data_unique_ID["Sex"] == "M"].groupby(usa_data_unique_ID["Games"]).count(),
-                            "Number of Females from USA":usa_data_unique_ID["Sex"][usa_data_unique_ID["Sex"] == "F"].groupby(usa_data_unique_ID["Games"]).count()}).reset_index()
-    gender_world = pd.DataFrame({"Total Number Males":world_data_unique_ID["Sex"][world_data_unique_ID["Sex"] == "M"].groupby(world_data_unique_ID["Games"]).count(),
-                            "Total Number Females":world_data_unique_ID["Sex"][world_data_unique_ID["Sex"] == "F"].groupby(world_data_unique_ID["Games"]).count()}).reset_index()
+    #Creates gender data for the country and the world
+    gender_country = pd.DataFrame({males_column:country.select(Sex="M").sum("Games"),
+                            females_column:country.select(Sex="F").sum("Games")}).reset_index()
+    gender_world = pd.DataFrame({"Total Number Males":world.select(Sex="M").sum("Games"),
+                            "Total Number Females":world.select(Sex="F").sum("Games")}).reset_index()
 
     #Merge the gender data with the participants data and fill the NaN (created when there were no females in the data) with 0
-    participants_data = pd.merge(participants_data, gender_usa, on="Games", how="left").fillna(0)
+    participants_data = pd.merge(participants_data, gender_country, on="Games", how="left").fillna(0)
     participants_data = pd.merge(participants_data, gender_world, on="Games", how="left").fillna(0)
 
-    #Calculates the percentage of female and male participants from USA and the world
-    participants_data["Female Participants from USA (%)"] = ((participants_data["Number of Females from USA"]/participants_data["Participants from USA"])*100).round(1)
-    participants_data["Male Participants from USA (%)"] = ((participants_data["Number of Males from USA"]/participants_data["Participants from USA"])*100).round(1)
+    #Calculates the percentage of female and male participants from the country and the world
+    participants_data[f"Female Participants from {noc} (%)"] = ((participants_data[females_column]/participants_data[participants_column])*100).round(1)
+    participants_data[f"Male Participants from {noc} (%)"] = ((participants_data[males_column]/participants_data[participants_column])*100).round(1)
     participants_data["World Female Participants (%)"] = ((participants_data["Total Number Females"]/participants_data["Total Number of Participants"])*100).round(1)
     participants_data["World Male Participants (%)"] = ((participants_data["Total Number Males"]/participants_data["Total Number of Participants"])*100).round(1)
 
-    return participants_data
+    #The merges put the columns in another order when the country has no participants
+    return participants_data[["Year", "Season", "Games", participants_column, "Total Number of Participants", percentage_column,
+                            males_column, females_column, "Total Number Males", "Total Number Females",
+                            f"Female Participants from {noc} (%)", f"Male Participants from {noc} (%)",
+                            "World Female Participants (%)", "World Male Participants (%)"]]
+
+#AGE SUMMARIES
+
+#Fixed one year wide age bins and a fixed grid for the density, so a summary has the same size for every sport
+AGE_BINS = np.arange(0, 101)
+AGE_DENSITY_GRID = np.linspace(0, 100, 201)
+
+
+@timed
+def summarize_ages(ages: pd.Series, density: bool = True) -> dict:
+    """
+    Summarizes an age distribution with a few numbers instead of one value per athlete.
+
+    Parameters
+    ----------
+    ages : pd.Series
+        The ages (missing ages are ignored).
+    density : bool
+        Also estimate the density (gaussian kernel, Scott's bandwidth) on AGE_DENSITY_GRID (default True).
+
+    Returns
+    -------
+    summary : dict
+        count, mean, std (population standard deviation, as scipy.stats.norm.fit), min, max,
+        histogram (counts per AGE_BINS bin, ages outside the bins are counted in the first or last bin)
+        and density (None if density is False or there are less than two ages).
+        mean, std, min and max are None if there are no ages.
+    """
+
+    ages = ages.dropna().to_numpy(dtype=float)
+    histogram = np.bincount(np.clip(ages, AGE_BINS[0], AGE_BINS[-1] - 1).astype(int) - AGE_BINS[0], minlength=len(AGE_BINS) - 1)
+
+    if len(ages) == 0:
+        return _age_summary(histogram, 0, None, None, None, None, density)
+
+    return _age_summary(histogram, len(ages), ages.mean(), ages.std(), ages.min(), ages.max(), density)
+
+
+@timed
+def summarize_age_counts(ages: np.ndarray, counts: np.ndarray, density: bool = True) -> dict:
+    """
+    Summarizes an age distribution given as distinct ages and the number of athletes with each age (e.g. a PrefixSums window).
+
+    Parameters
+    ----------
+    ages : np.ndarray
+        The distinct ages.
+    counts : np.ndarray
+        The number of athletes with each age.
+    density : bool
+        Also estimate the density (default True).
+
+    Returns
+    -------
+    summary : dict
+        The same as summarize_ages for the ages repeated counts times.
+    """
+
+    ages, counts = np.asarray(ages, dtype=float)[counts > 0], counts[counts > 0]
+    histogram = np.bincount(np.clip(ages, AGE_BINS[0], AGE_BINS[-1] - 1).astype(int) - AGE_BINS[0], weights=counts,
+                            minlength=len(AGE_BINS) - 1).astype(np.int64)
+
+    count = int(counts.sum())
+    if count == 0:
+        return _age_summary(histogram, 0, None, None, None, None, density)
+
+    mean = (ages * counts).sum() / count
+    std = np.sqrt(((ages - mean) ** 2 * counts).sum() / count)
+
+    return _age_summary(histogram, count, mean, std, ages.min(), ages.max(), density)
+
+
+def _age_summary(histogram: np.ndarray, count: int, mean, std, youngest, oldest, density: bool) -> dict:
+    """Returns: the summary dict of summarize_ages, with the density estimated from the histogram"""
+
+    summary = dict(count=count, mean=mean, std=std, min=youngest, max=oldest, histogram=histogram.tolist(), density=None)
+
+    if density and count > 1 and std > 0:
+        #The ages are whole years, so every bin stands for the age at its lower edge
+        #and the kernel sum runs over the bins instead of over every athlete
+        bandwidth = 1.06 * std * count ** (-1 / 5)
+        distances = (AGE_DENSITY_GRID[:, np.newaxis] - AGE_BINS[np.newaxis, :-1]) / bandwidth
+        kernels = np.exp(-0.5 * distances ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+        summary["density"] = (kernels @ histogram / count).tolist()
+
+    return summary
+
 
 class SportStatistics:
 
+    # gender choices in the dashboard and the matching values in the Sex column
+    _SEXES = dict(both=None, male="M", female="F")
+
+    # sports in the dashboard and the sports in the data they are made of
+    _SPORTS = {"Alpine Skiing": ["Alpine Skiing"], "Basketball": ["Basketball"], "Gymnastics": ["Gymnastics", "Rhythmic Gymnastics"]}
+
+    # Running does not have its own sport tag, its under Atheltics
+    _RUNNING_EVENTS = ["Athletics Women's 100 metres", "Athletics Women's 200 metres", "Athletics Women's 400 metres",  "Athletics Women's 800 metres", "Athletics Women's 1,500 metres", 
+    "Athletics Women's 3,000 metres", "Athletics Women's 5,000 metres", "Athletics Women's 10,000 metres",  "Athletics Women's Marathon", "Athletics Men's 60 metres", 
+    "Athletics Men's 100 metres", "Athletics Men's 200 metres", "Athletics Men's 400 metres", "Athletics Men's 800 metres", "Athletics Men's 1,500 metres", 
+    "Athletics Men's 5,000 metres", "Athletics Men's 10,000 metres", "Athletics Men's Marathon"]
+
+    @timed
     def __init__(self) -> None:
         read_data = import_world_data()
-        sports = read_data[read_data["Sport"].isin(["Alpine Skiing", "Basketball", "Gymnastics", "Rhythmic Gymnastics"])]
-
-        # Running does not have its own sport tag, its under Atheltics
-        running_events = ["Athletics Women's 100 metres", "Athletics Women's 200 metres", "Athletics Women's 400 metres",  "Athletics Women's 800 metres", "Athletics Women's 1,500 metres", 
-        "Athletics Women's 3,000 metres", "Athletics Women's 5,000 metres", "Athletics Women's 10,000 metres",  "Athletics Women's Marathon", "Athletics Men's 60 metres", 
-        "Athletics Men's 100 metres", "Athletics Men's 200 metres", "Athletics Men's 400 metres", "Athletics Men's 800 metres", "Athletics Men's 1,500 metres", 
-        "Athletics Men's 5,000 metres", "Athletics Men's 10,000 metres", "Athletics Men's Marathon"]
-        running = read_data[read_data["Event"].isin(running_events)]
+        sports = read_data[read_data["Sport"].isin([name for names in self._SPORTS.values() for name in names])]
+        running = read_data[read_data["Event"].isin(self._RUNNING_EVENTS)]
         
         # add Running to sports
-        sports = sports.append(running)
-        sports.reset_index(drop=True, inplace=True)
+        sports = pd.concat([sports, running], ignore_index=True)
 
         # renaming Athletics to Running and Rhythmic Gymnastics to Gymnastics
-        sports.loc[sports["Sport"] == "Athletics", "Sport"] = "Running"
-        sports.loc[sports["Sport"] == "Rhythmic Gymnastics", "Sport"] = "Gymnastics"
+        # (Sport is categorical and Running is not one of its categories, so the renamed column is built from strings)
+        sports["Sport"] = sports["Sport"].astype(object).replace({"Athletics": "Running", "Rhythmic Gymnastics": "Gymnastics"}).astype("category")
 
         self._data = sports
 
+        # the counts (medals and participants per year) are answered by the cube, selected with these filters per sport
+        self._cube = get_cube()
+        self._filters = {sport: dict(Sport=names) for sport, names in self._SPORTS.items()}
+        self._filters["Running"] = dict(Event=self._RUNNING_EVENTS)
+
+        # split the data once per sport and sex, so every statistic starts from a ready-made slice
+        self._slices = {}
+        for sport, sport_data in sports.groupby("Sport", sort=False, observed=True):
+            self._slices[sport] = self._split_sexes(sport_data)
+
+        # the age summaries are small and the same size for every sport, so they are computed up front
+        self._age_summaries = {sport: dict(Male=summarize_ages(self.sport_and_year(sport, "M")["Age"]),
+                                            Female=summarize_ages(self.sport_and_year(sport, "F")["Age"]))
+                                for sport in self._slices}
+
+        # ages and heights counted per year and cumulated, for the statistics of a year window
+        athletes = Cube.from_frame(sports, ["Year", "Sport", "Sex", "Medal", "Age", "Height"])
+        self._age_sums = {sport: {sex: PrefixSums(athletes.select(Sport=sport, Sex=sex), "Age") for sex in ["M", "F"]}
+                            for sport in self._slices}
+        self._height_sums = {sex: PrefixSums(athletes.select(Sport="Basketball", Sex=sex), ["Medal", "Height"]) for sex in [None, "M", "F"]}
+
+    @staticmethod
+    def _split_sexes(data) -> dict:
+        """Returns: dict with the data for both sexes (key None) and for each sex (keys M and F)"""
+        return {None: data, "M": data[data["Sex"] == "M"], "F": data[data["Sex"] == "F"]}
+
+    @classmethod
+    def sport_names(cls) -> List[str]:
+        """Returns: Sorted list of the sports the statistics are computed for (without loading the data)"""
+        return sorted(list(cls._SPORTS) + ["Running"])
+
     def sports(self) -> List:
         """Returns: Sorted list of sports"""
-        return self._data["Sport"].sort_values().unique()
-
-    def medals(self, sport, gender) -> DataFrame:
-        """Returns: Medal count for top 10 countries based on sport and gender"""
+        return np.asarray(self._data["Sport"].sort_values().unique())
 
-        # select correct sport
-        medal_data = self.sport_and_year(sport)
-        medal_data = unique_medals(medal_data)
+    @timed
+    def medals(self, sport, gender, years=None) -> DataFrame:
+        """Returns: Medal count for top 10 countries based on sport and gender (in the years start to end, if given)"""
 
-        # selects gender
-        if gender == "both":
-            medal_data = medal_data["Medal"].groupby(medal_data["NOC"]).count().sort_values(ascending=False).head(10)
-        elif gender == "male":
-            medal_data = medal_data[medal_data["Sex"] == "M"]["Medal"].groupby(medal_data["NOC"]).count().sort_values(ascending=False).head(10)
-        else:
-            medal_data = medal_data[medal_data["Sex"] == "F"]["Medal"].groupby(medal_data["NOC"]).count().sort_values(ascending=False).head(10)
+        # medals per country for the sport and gender (a team medal is only counted once), cumulated over the years
+        prefix_sums = self._cube.prefix_sums("medals", "NOC", Sex=self._SEXES[gender], **self._filters.get(sport, dict(Sport=[sport])))
+        medal_data = prefix_sums.window_sum(years)
+        medal_data = medal_data.sort_values(ascending=False).head(10)
         
-        # prepare data for plot
-        medal_data = pd.DataFrame(dict(NOC = medal_data.index, Medal = medal_data)).reset_index(drop=True)
+        # prepare data for plot (NOC as strings, a categorical would carry the categories of every country into the plot)
+        medal_data = pd.DataFrame(dict(NOC = np.asarray(medal_data.index), Medal = medal_data)).reset_index(drop=True)
         
         return medal_data
 
-    def gender(self, sport) -> DataFrame:
-        """Returns: gender count per year for selected sport and gender"""
-
-        # select correct sport
-        gender_data = self.sport_and_year(sport)
-
-        # male data
-        gender_data_m = gender_data[gender_data["Sex"] == "M"]
-        gender_data_m = gender_data_m["Sex"].groupby(gender_data_m["Year"]).count()
+    @timed
+    def gender(self, sport, years=None) -> DataFrame:
+        """Returns: gender count per year for selected sport and gender (in the years start to end, if given)"""
 
-        # female data
-        gender_data_f = gender_data[gender_data["Sex"] == "F"]
-        gender_data_f = gender_data_f["Sex"].groupby(gender_data_f["Year"]).count()
+        # male and female data (every participation in an event is counted)
+        gender_data_m = self._cube_select(self._cube.entries, sport, "M").sum("Year")
+        gender_data_f = self._cube_select(self._cube.entries, sport, "F").sum("Year")
 
         # prepare data for plot
         gender_data = pd.DataFrame(dict(Male = gender_data_m, Female = gender_data_f)).reset_index()
 
+        # one row per year, so a year window only keeps some of the rows
+        if years is not None:
+            gender_data = gender_data[gender_data["Year"].between(*years)].reset_index(drop=True)
+
         return gender_data
     
+    @timed
     def age(self, sport) -> DataFrame:
         """Returns: ages of everyone in selected sport"""
-        
-        # select correct sport
-        age_data = self.sport_and_year(sport)
 
         # new DataFrame with all ages from males and females
-        age_data = pd.DataFrame([age_data["Age"][age_data["Sex"] == "M"], 
-                                    age_data["Age"][age_data["Sex"] == "F"]], 
+        age_data = pd.DataFrame([self.sport_and_year(sport, "M")["Age"], 
+                                    self.sport_and_year(sport, "F")["Age"]], 
                                     index=["Male", "Female"])
         age_data = age_data.transpose().reset_index(drop=True)
 
         return age_data
 
-    def height_basketball(self, gender) -> DataFrame:
-        """Returns: mean height per medal for basketball players for selected gender"""
+    @timed
+    def age_summary(self, sport, years=None) -> dict:
+        """Returns: dict with the age summary (see summarize_ages) for Male and Female in selected sport (in the years start to end, if given)"""
+        if years is None:
+            return self._age_summaries.get(sport, dict(Male=summarize_ages(pd.Series(dtype=float)),
+                                                        Female=summarize_ages(pd.Series(dtype=float))))
 
-        # select basketball data
-        height_data = self.sport_and_year("Basketball")
+        if sport not in self._age_sums:
+            return dict(Male=summarize_age_counts(np.zeros(0), np.zeros(0, dtype=np.int64)),
+                        Female=summarize_age_counts(np.zeros(0), np.zeros(0, dtype=np.int64)))
 
-        # select gender
-        if gender == "male":
-            height_data = height_data[height_data["Sex"] == "M"]
-        elif gender == "female":
-            height_data = height_data[height_data["Sex"] == "F"]
-        else:
-            pass
+        # the number of athletes per age in the window (the last entry counts the missing ages)
+        return {name: summarize_age_counts(self._age_sums[sport][sex].labels["Age"], self._age_sums[sport][sex].window(years)[:-1])
+                for name, sex in [("Male", "M"), ("Female", "F")]}
+
+    @timed
+    def height_basketball(self, gender, years=None) -> DataFrame:
+        """Returns: mean height per medal for basketball players for selected gender (in the years start to end, if given)"""
 
-        # calculate mean height for players with a medal
         mean_hight_data = {}
-        for medal in ["Gold", "Silver", "Bronze"]:
-            mean_hight_data[medal] = height_data[height_data["Medal"] == medal]["Height"].mean()
+        if years is None:
+            # select basketball data for the gender
+            height_data = self.sport_and_year("Basketball", self._SEXES[gender])
 
-        # add mean height for players without a medal
-        mean_hight_data["No medal"] = height_data[height_data["Medal"].isna()]["Height"].mean()
+            # calculate mean height for players with a medal
+            for medal in ["Gold", "Silver", "Bronze"]:
+                mean_hight_data[medal] = height_data[height_data["Medal"] == medal]["Height"].astype(float).mean()
+
+            # add mean height for players without a medal
+            mean_hight_data["No medal"] = height_data[height_data["Medal"].isna()]["Height"].astype(float).mean()
+        else:
+            # number of players per medal (the last row is no medal) and height (the last column is a missing height) in the window
+            prefix_sums = self._height_sums[self._SEXES[gender]]
+            counts = prefix_sums.window(years)[:, :-1]
+            heights = prefix_sums.labels["Height"].astype(float)
+            medals = list(prefix_sums.labels["Medal"])
+
+            for medal, row in [(medal, medals.index(medal) if medal in medals else None) for medal in ["Gold", "Silver", "Bronze"]] + [("No medal", -1)]:
+                players = counts[row].sum() if row is not None else 0
+                mean_hight_data[medal] = (counts[row] * heights).sum() / players if players > 0 else np.nan
 
         # prepare data for plot
         mean_hight_data = pd.DataFrame(mean_hight_data.items(), columns=["Medal", "Mean height"])
@@ -325,9 +711,111 @@ class SportStatistics:
         return mean_hight_data
 
     # help function for selecting sport
-    def sport_and_year(self, sport) -> DataFrame:
-        """Returns: Dataframe with specific sport"""
-        data = self._data[self._data["Sport"] == sport]
+    def sport_and_year(self, sport, sex=None) -> DataFrame:
+        """Returns: Dataframe with specific sport (and sex, M or F, if given)"""
+        return self._select(self._slices, sport, sex)
+
+    def _select(self, slices, sport, sex) -> DataFrame:
+        """Returns: the precomputed slice for the sport and sex (empty if the sport has no data)"""
+        if sport not in slices:
+            return self._data.iloc[0:0]
+
+        return slices[sport][sex]
+
+    def _cube_select(self, cube, sport, sex) -> Cube:
+        """Returns: the cells of the cube for the sport and sex (M, F or None for both)"""
+        return cube.select(Sex=sex, **self._filters.get(sport, dict(Sport=[sport])))
+
+
+#SHARED SPORT STATISTICS
+
+#Built on first use (or in the background by load_in_background) instead of when the app is imported: (dataset version, SportStatistics)
+_sport_statistics = None
+_sport_statistics_lock = threading.Lock()
+
+
+@timed
+def get_sport_statistics() -> SportStatistics:
+    """
+    Returns the SportStatistics for the shared dataset.
+    It is built on the first call (and again when the dataset version changes), callers that arrive while it is built wait for it.
+    """
+
+    global _sport_statistics
+
+    version = dataset_version()
+    with _sport_statistics_lock:
+        if _sport_statistics is None or _sport_statistics[0] != version:
+            _sport_statistics = (version, SportStatistics())
+
+        return _sport_statistics[1]
+
+
+def sport_statistics_ready() -> bool:
+    """Returns: True if the SportStatistics for the shared dataset has been built (get_sport_statistics will not wait)"""
+    sport_statistics = _sport_statistics
+    return sport_statistics is not None and sport_statistics[0] == dataset_version()
+
+
+def load_in_background() -> threading.Thread:
+    """Starts a daemon thread that loads the shared dataset and builds the SportStatistics, so the first request does not have to."""
+
+    thread = threading.Thread(target=get_sport_statistics, name="load-sport-statistics", daemon=True)
+    thread.start()
+
+    return thread
+
+
+#SHARED CUBE
+
+#The medal and participation cube of the shared dataset, built on first use: (dataset version, OlympicCube)
+_cube = None
+_cube_lock = threading.Lock()
+
+
+@timed
+def get_cube() -> OlympicCube:
+    """
+    Returns the medal and participation cube (see medal_cube.py) for the shared dataset.
+    It is built on the first call (and again when the dataset version changes).
+    """
+
+    global _cube
+
+    version = dataset_version()
+    with _cube_lock:
+        if _cube is None or _cube[0] != version:
+            _cube = (version, OlympicCube(import_world_data()))
+
+        return _cube[1]
+
+
+#MEMORY REPORT
+
+def memory_report() -> pd.DataFrame:
+    """
+    Compares the memory of the dataset with the default types (as pd.read_csv gives them) and with WORLD_DATA_SCHEMA.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per column and a Total row.
+        Columns: Default dtype, Default MiB, Compact dtype, Compact MiB and Saved (%).
+    """
+
+    default = columnar_cache.read_table(WORLD_DATA_PATH)
+    compact = columnar_cache.read_table(WORLD_DATA_PATH, dtypes=WORLD_DATA_SCHEMA)
+
+    default_bytes = default.memory_usage(index=False, deep=True)
+    compact_bytes = compact.memory_usage(index=False, deep=True)
+
+    report = pd.DataFrame({"Default dtype": default.dtypes.astype(str), "Default MiB": default_bytes / 2**20,
+                            "Compact dtype": compact.dtypes.astype(str), "Compact MiB": compact_bytes / 2**20})
+    report.loc["Total"] = ["", default_bytes.sum() / 2**20, "", compact_bytes.sum() / 2**20]
+    report["Saved (%)"] = (100 * (1 - report["Compact MiB"] / report["Default MiB"])).round(1)
+
+    return report.round({"Default MiB": 2, "Compact MiB": 2})
 
-        return data
 
+if __name__ == "__main__":
+    print(memory_report().to_string())
@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+# Measures the memory of the gunicorn workers, with the app loaded in every worker (PRELOAD_APP=0)
+# and loaded once in the master before forking (PRELOAD_APP=1, see gunicorn.conf.py).
+# Rss counts every page a worker uses, Pss divides the shared pages between the processes that share them,
+# so the sum of Pss is the real memory used by the workers. Linux only (reads /proc/<pid>/smaps_rollup).
+# Usage: python measure_workers.py --workers 4 [--requests 40]
+
+# one request for each figure on the USA tab, so every worker loads the data and aggregates it uses
+USA_FIGURES = [("medals", "medals_year", "all", True),
+                ("medals", "top_ten_sports_events", "all", True),
+                ("participants", "participants", "All", True),
+                ("participants", "gender", "all", False)]
+
+
+def memory(pid: int) -> dict:
+    """Returns: Rss, Pss, Shared and Private memory of a process in kB"""
+
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+
+    return dict(rss=values["Rss"],
+                pss=values["Pss"],
+                shared=values["Shared_Clean"] + values["Shared_Dirty"],
+                private=values["Private_Clean"] + values["Private_Dirty"])
+
+
+def children(pid: int) -> list:
+    """Returns: the pids of the child processes of a process"""
+
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                # the parent pid is the second field after the command name (which is in parentheses)
+                parent = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == pid:
+            pids.append(int(entry))
+
+    return pids
+
+
+def request_figure(url: str, figure: tuple) -> None:
+    """Asks the server for a figure on the USA tab (the same request the browser sends)."""
+
+    payload = dict(output="usa-graph.figure",
+                    outputs=dict(id="usa-graph", property="figure"),
+                    inputs=[dict(id=id, property="value", value=value) for id, value in
+                            zip(["usa-dropdown", "second-dropdown", "radio-settings", "my-toggle-switch"], figure)],
+                    changedPropIds=["usa-dropdown.value"])
+    request = urllib.request.Request(f"{url}/_dash-update-component", data=json.dumps(payload).encode(),
+                                        headers={"Content-Type": "application/json"})
+    urllib.request.urlopen(request, timeout=120).read()
+
+
+def measure(preload: bool, workers: int, port: int, requests: int, timeout: float = 300) -> dict:
+    """
+    Starts gunicorn, sends requests until every worker has had the chance to load its data and measures the workers.
+
+    Returns
+    -------
+    result : dict
+        preload, master (memory of the master), workers (memory per worker) and total_pss (kB, master and workers).
+    """
+
+    environment = dict(os.environ, PRELOAD_APP="1" if preload else "0", WEB_CONCURRENCY=str(workers), PORT=str(port))
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "index:server"], env=environment)
+    url = f"http://127.0.0.1:{port}"
+
+    try:
+        start = time.monotonic()
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=5).read()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() - start > timeout:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.5)
+
+        # the requests are spread over the workers by the operating system, so several rounds are sent
+        for index in range(requests):
+            request_figure(url, USA_FIGURES[index % len(USA_FIGURES)])
+
+        worker_pids = children(server.pid)
+        worker_memory = [memory(pid) for pid in worker_pids]
+        master_memory = memory(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    return dict(preload=preload,
+                master=master_memory,
+                workers=worker_memory,
+                total_pss=master_memory["pss"] + sum(worker["pss"] for worker in worker_memory))
+
+
+def print_result(result: dict) -> None:
+    print(f"\nPRELOAD_APP={int(result['preload'])}")
+    print(f"{'process':<10} {'Rss MiB':>10} {'Pss MiB':>10} {'Shared MiB':>11} {'Private MiB':>12}")
+    for name, values in [("master", result["master"])] + [(f"worker {index}", values) for index, values in enumerate(result["workers"])]:
+        print(f"{name:<10} {values['rss'] / 1024:10.1f} {values['pss'] / 1024:10.1f} {values['shared'] / 1024:11.1f} {values['private'] / 1024:12.1f}")
+    print(f"{'total Pss':<10} {'':>10} {result['total_pss'] / 1024:10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the memory of the gunicorn workers with and without preloading the app.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--requests", type=int, default=40, help="figure requests sent before measuring")
+    args = parser.parse_args()
+
+    for preload in [False, True]:
+        print_result(measure(preload, args.workers, args.port, args.requests))
@@ -0,0 +1,179 @@
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from unique_medals import unique_medals
+
+# Precomputed counts over the dimensions every dashboard question is about (Games, NOC, Sport, Event, Sex and Medal).
+# A Cube stores only the non-empty cells (sparse COO format): an integer code per dimension and a count for every cell.
+# Medal totals, percentages, top lists, gender splits and participant counts are answered by selecting cells
+# and summing the counts with numpy, instead of filtering and grouping the rows of the dataset.
+# For the year range of the dashboards, PrefixSums keeps the counts of a cube cumulated over the years,
+# so the counts of any year window are the difference of two rows instead of a new sum over the cells.
+
+
+class Cube:
+    """Sparse counts over integer coded dimensions."""
+
+    def __init__(self, labels: Dict[str, np.ndarray], codes: Dict[str, np.ndarray], counts: np.ndarray,
+                lookup: dict = None, cells: np.ndarray = None) -> None:
+        # dimension -> sorted labels, dimension -> code of every cell (-1 for a missing value), count of every cell
+        self.labels = labels
+        self._codes = codes
+        self._counts = counts
+        # dimension -> {label: code}
+        self._lookup = lookup if lookup is not None else {dimension: {label: code for code, label in enumerate(values)}
+                                                            for dimension, values in labels.items()}
+        # positions of the selected cells (None for all), a selection shares the arrays of the full cube
+        self._cells = cells
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, dimensions: List[str]) -> "Cube":
+        """Returns: the cube with the number of rows of frame in every combination of the dimensions (columns of frame)"""
+
+        factorized = [pd.factorize(frame[dimension], sort=True) for dimension in dimensions]
+        # missing values get the code after the last label while the cells are counted
+        shape = [len(uniques) + 1 for _, uniques in factorized]
+        row_codes = [np.where(codes >= 0, codes, len(uniques)) for codes, uniques in factorized]
+
+        cells, counts = np.unique(np.ravel_multi_index(row_codes, shape), return_counts=True)
+        cell_codes = np.unravel_index(cells, shape)
+
+        labels = {dimension: np.asarray(uniques) for dimension, (_, uniques) in zip(dimensions, factorized)}
+        codes = {dimension: np.where(codes == len(uniques), -1, codes).astype(np.int32)
+                for dimension, codes, (_, uniques) in zip(dimensions, cell_codes, factorized)}
+
+        return cls(labels, codes, counts.astype(np.int64))
+
+    def codes(self, dimension: str) -> np.ndarray:
+        """Returns: the code of every selected cell for the dimension"""
+        codes = self._codes[dimension]
+        return codes if self._cells is None else codes[self._cells]
+
+    def counts(self) -> np.ndarray:
+        """Returns: the count of every selected cell"""
+        return self._counts if self._cells is None else self._counts[self._cells]
+
+    def select(self, **filters) -> "Cube":
+        """
+        Returns: the cube with only the cells that match every filter.
+        A filter is dimension=label or dimension=list of labels (None selects everything), unknown labels match nothing.
+        """
+
+        cells = self._cells if self._cells is not None else np.arange(len(self._counts))
+        for dimension, values in filters.items():
+            if values is None:
+                continue
+            if isinstance(values, str) or np.ndim(values) == 0:
+                values = [values]
+            lookup = self._lookup[dimension]
+            # True for the selected codes, indexed by the code of every cell (the last entry is for the missing code -1)
+            wanted = np.zeros(len(self.labels[dimension]) + 1, dtype=bool)
+            wanted[[lookup[value] for value in values if value in lookup]] = True
+            cells = cells[wanted[self._codes[dimension][cells]]]
+
+        return Cube(self.labels, self._codes, self._counts, self._lookup, cells)
+
+    def sum(self, by: Union[str, List[str]]) -> pd.Series:
+        """
+        Returns: the counts summed per label (or combination of labels) of the by dimension(s), like a groupby count.
+        Only non-empty groups are included, sorted by label, and cells with a missing value in a by dimension are left out.
+        """
+
+        single = isinstance(by, str)
+        by = [by] if single else list(by)
+
+        by_codes = [self.codes(dimension) for dimension in by]
+        valid = np.ones(len(self.counts()), dtype=bool)
+        for codes in by_codes:
+            valid &= codes >= 0
+
+        shape = [max(len(self.labels[dimension]), 1) for dimension in by]
+        groups, inverse = np.unique(np.ravel_multi_index([codes[valid] for codes in by_codes], shape), return_inverse=True)
+        totals = np.bincount(inverse, weights=self.counts()[valid], minlength=len(groups)).astype(np.int64)
+
+        group_labels = [self.labels[dimension][codes] for dimension, codes in zip(by, np.unravel_index(groups, shape))]
+        if single:
+            index = pd.Index(group_labels[0], name=by[0])
+        else:
+            index = pd.MultiIndex.from_arrays(group_labels, names=by)
+
+        return pd.Series(totals, index=index, name="count")
+
+    def total(self) -> int:
+        """Returns: the sum of all selected counts"""
+        return int(self.counts().sum())
+
+
+class PrefixSums:
+    """Counts of a cube per year and label(s) of the by dimension(s), cumulated over the years."""
+
+    def __init__(self, cube: Cube, by: Union[str, List[str]], along: str = "Year") -> None:
+        self.by = [by] if isinstance(by, str) else list(by)
+        self.labels = {dimension: cube.labels[dimension] for dimension in self.by}
+        self.years = cube.labels[along]
+
+        # one row per year, and one axis per by dimension with a last entry for the missing values
+        shape = [len(self.years)] + [len(self.labels[dimension]) + 1 for dimension in self.by]
+        codes = [cube.codes(along)] + [np.where(cube.codes(dimension) >= 0, cube.codes(dimension), len(self.labels[dimension]))
+                                        for dimension in self.by]
+        counts = np.bincount(np.ravel_multi_index(codes, shape), weights=cube.counts(), minlength=int(np.prod(shape))).astype(np.int64)
+
+        # row i holds the counts of the years before years[i], the last row the counts of all years
+        self.cumulative = np.zeros([len(self.years) + 1] + shape[1:], dtype=np.int64)
+        np.cumsum(counts.reshape(shape), axis=0, out=self.cumulative[1:])
+
+    def window(self, years: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """
+        Returns: the counts in the years start to end (inclusive, None for all years),
+        one axis per by dimension (the last entry of each axis counts the missing values)
+        """
+
+        if years is None:
+            return self.cumulative[-1] - self.cumulative[0]
+
+        start, end = years
+        return self.cumulative[np.searchsorted(self.years, end, side="right")] - self.cumulative[np.searchsorted(self.years, start, side="left")]
+
+    def window_sum(self, years: Optional[Tuple[int, int]] = None) -> pd.Series:
+        """Returns: the counts in the year window per label of the by dimension, like Cube.sum (non-empty labels, sorted)"""
+
+        if len(self.by) != 1:
+            raise ValueError("window_sum needs a single by dimension, use window for several")
+
+        counts = self.window(years)[:-1]
+        labels = self.labels[self.by[0]]
+        return pd.Series(counts[counts > 0], index=pd.Index(labels[counts > 0], name=self.by[0]), name="count")
+
+
+class OlympicCube:
+    """The cubes of a dataset (with the columns of load_data.import_world_data)."""
+
+    def __init__(self, world_data: pd.DataFrame) -> None:
+        # medals, counted once per NOC, event, Games and medal (a team medal is one medal)
+        self.medals = Cube.from_frame(unique_medals(world_data), ["Year", "Games", "NOC", "Sport", "Event", "Sex", "Medal"])
+
+        # every row (an athlete in an event), for the number of entries per year
+        self.entries = Cube.from_frame(world_data, ["Year", "Games", "NOC", "Sport", "Event", "Sex", "Medal"])
+
+        # athletes, counted once per Games and NOC
+        self.participants = Cube.from_frame(world_data.drop_duplicates(subset=["Games", "NOC", "ID"]), ["Year", "Games", "NOC", "Sex"])
+
+        # athletes, counted once per Games (an athlete can take part for two NOCs in the same Games)
+        self.world_participants = Cube.from_frame(world_data.drop_duplicates(subset=["Games", "ID"]), ["Year", "Games", "Sex"])
+
+        # prefix sums built on first use: (cube name, by, filters) -> PrefixSums
+        self._prefix_sums = {}
+
+    def prefix_sums(self, cube: str, by: Union[str, List[str]], **filters) -> PrefixSums:
+        """Returns: the PrefixSums of a cube (medals, entries, participants or world_participants) selected by filters (see Cube.select)"""
+
+        key = (cube, str(by), repr(sorted(filters.items())))
+        prefix_sums = self._prefix_sums.get(key)
+        if prefix_sums is None:
+            prefix_sums = self._prefix_sums[key] = PrefixSums(getattr(self, cube).select(**filters), by)
+
+        return prefix_sums
+
+    def clear_prefix_sums(self) -> None:
+        """Forgets the prefix sums built so far (they are built again on first use)."""
+        self._prefix_sums.clear()
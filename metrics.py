@@ -0,0 +1,110 @@
+import bisect
+import contextlib
+import functools
+import threading
+import time
+from typing import Callable, Dict, Sequence
+
+# Metrics for the dashboard in the Prometheus text format (served on /metrics, see app.py).
+# Latency histograms for the Dash callbacks (per output) and for the load_data and plot_figures functions,
+# response sizes of the callbacks and the hit rates of the caches.
+# Every process keeps its own metrics, with several gunicorn workers each scrape sees the worker that answered.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    """Histogram with fixed buckets and one series per label value."""
+
+    def __init__(self, name: str, description: str, label: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                # counts per bucket (the last one is +Inf), sum of the values
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        """Returns: the lines of the histogram in the Prometheus text format"""
+
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, (counts, total) in sorted(self._series.items()):
+                label = f'{self.label}="{_escape(label_value)}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{label},le="{"+Inf" if bound == float("inf") else bound}"}} {cumulative}')
+                lines.append(f"{self.name}_sum{{{label}}} {total}")
+                lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+
+        return lines
+
+
+callback_seconds = Histogram("dashboard_callback_seconds", "Time to answer a Dash callback request (including serialization).",
+                                "callback", LATENCY_BUCKETS)
+callback_response_bytes = Histogram("dashboard_callback_response_bytes", "Size of the Dash callback responses.",
+                                    "callback", BYTES_BUCKETS)
+function_seconds = Histogram("dashboard_function_seconds", "Time spent in the load_data, plot_figures and figure serialization functions.",
+                                "function", LATENCY_BUCKETS)
+
+# name -> function that returns a dict with (at least) hits and misses
+_caches: Dict[str, Callable[[], dict]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], dict]) -> None:
+    """Adds a cache to the metrics, stats is called on every scrape and returns a dict with hits and misses."""
+    _caches[name] = stats
+
+
+@contextlib.contextmanager
+def timer(name: str):
+    """Context manager that records the time spent in the block in function_seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        function_seconds.observe(name, time.perf_counter() - start)
+
+
+def timed(function):
+    """Decorator that records the time of every call in function_seconds (labelled module.function)."""
+    name = f"{function.__module__}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with timer(name):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def render() -> str:
+    """Returns: every metric in the Prometheus text format"""
+
+    lines = []
+    for histogram in [callback_seconds, callback_response_bytes, function_seconds]:
+        lines.extend(histogram.render())
+
+    cache_stats = {name: stats() for name, stats in sorted(_caches.items())}
+    for metric in ["hits", "misses"]:
+        lines.append(f"# HELP dashboard_cache_{metric}_total Number of cache {metric}.")
+        lines.append(f"# TYPE dashboard_cache_{metric}_total counter")
+        lines.extend(f'dashboard_cache_{metric}_total{{cache="{_escape(name)}"}} {stats[metric]}' for name, stats in cache_stats.items())
+
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    """Returns: a label value escaped for the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
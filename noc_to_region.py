@@ -1,14 +1,45 @@
+import numpy as np
 import pandas as pd
+import columnar_cache
 
-# import noc_regions.csv
-_noc = pd.read_csv("Data/noc_regions.csv")
+# import noc_regions.csv (from the columnar cache) without the "notes" column
+_noc = columnar_cache.read_table("Data/noc_regions.csv", columns=["NOC", "region"])
 
 # set NOC as index
 _noc.set_index("NOC", inplace=True)
 
-# remove the "notes" column
+# keep only the region
 _noc = _noc["region"]
 
 def noc_to_region(NOC) -> str:
-    """Method that returns a string with the region name"""
-    return _noc.loc[NOC]
\ No newline at end of file
+    """Method that returns a string with the region name (the NOC code itself if the region is unknown)"""
+    return noc_to_regions([NOC])[0]
+
+def noc_to_regions(NOCs, fallback=None) -> np.ndarray:
+    """
+    Maps many NOC codes to region names in one vectorized call.
+
+    Parameters
+    ----------
+    NOCs : array-like
+        The NOC codes.
+    fallback : str
+        The region for codes without a region (default None, which means the code itself).
+
+    Returns
+    -------
+    regions : np.ndarray
+        The region names, in the same order as the codes.
+    """
+
+    # every distinct code is only looked up once
+    codes, uniques = pd.factorize(np.asarray(NOCs, dtype=object))
+    positions = _noc.index.get_indexer(uniques)
+    regions = np.where(positions >= 0, _noc.to_numpy()[positions], None)
+
+    # codes that are unknown or have no region get the fallback
+    missing = pd.isna(regions)
+    regions[missing] = uniques[missing] if fallback is None else fallback
+
+    # missing codes (-1) pick the fallback appended last
+    return np.append(regions, fallback)[codes]
\ No newline at end of file
@@ -1,8 +1,20 @@
+import aggregates
 import load_data
+from metrics import timed
 import plotly.graph_objects as go
 import plotly_express as px 
 
-def plot_medals_per_year(season:str="all", percentage:bool=True) -> px.line:
+
+def years_in_title(title:str, years:tuple=None) -> str:
+    """Returns: the title with the year window added (the title itself when all years are shown)"""
+    if years is None:
+        return title
+
+    return f"{title} ({years[0]}-{years[1]})"
+
+
+@timed
+def plot_medals_per_year(season:str="all", percentage:bool=True, years:tuple=None) -> px.line:
     """
     Creates a plotly line graph, showing the US winnings in the Olympic Games.
 
@@ -12,6 +24,8 @@ def plot_medals_per_year(season:str="all", percentage:bool=True) -> px.line:
         The season to be shown, i.e. all, summer or winter (default all).
     percentage : bool
         If the medals should be shown in percentage of the total number of medals (else in numbers; default True).
+    years : tuple
+        The first and last year to be shown (default all years).
 
     Returns
     -------
@@ -20,7 +34,7 @@ def plot_medals_per_year(season:str="all", percentage:bool=True) -> px.line:
     """
 
     #Imports the data
-    medals_data = load_data.import_medals_count()
+    medals_data = aggregates.load_aggregate("medals_count")
 
     #Selects the data, sets the line color, color (if two lines) and creates data for when the Olympic Games was hosted by USA.
     if season == "all":
@@ -39,6 +53,11 @@ def plot_medals_per_year(season:str="all", percentage:bool=True) -> px.line:
         color=None
         OG_in_USA = medals_data.iloc[[12, 22, 31, 42]].reset_index(drop=True)
 
+    #Only keeps the Olympic Games in the year window (the data has one row per Olympic Game)
+    if years is not None:
+        dataset = dataset[dataset["Year"].between(*years)]
+        OG_in_USA = OG_in_USA[OG_in_USA["Year"].between(*years)].reset_index(drop=True)
+
     #Sets the title
     if season == "all" and percentage == True:
         title = "Percentage of Medals Won by the USA in the Olympic Games"
@@ -52,6 +71,7 @@ def plot_medals_per_year(season:str="all", percentage:bool=True) -> px.line:
         title = "Percentage of Medals Won by the USA in the Winter Olympic Games"
     elif season == "winter" and percentage == False:
         title = "Number of Medals Won by the USA in the Winter Olympic Games"
+    title = years_in_title(title, years)
 
     #Sets the y-data, hover_template and labels based on if values should be shown in percentage or not
     if percentage == True:
@@ -96,7 +116,8 @@ def plot_medals_per_year(season:str="all", percentage:bool=True) -> px.line:
     return fig
 
 
-def plot_top_ten_sports_or_events(y_data:str="all", sport:bool=True) -> px.bar:
+@timed
+def plot_top_ten_sports_or_events(y_data:str="all", sport:bool=True, years:tuple=None) -> px.bar:
     """
     Creates a plotly bar graph, showing the top sports (most medals) for the US.
 
@@ -112,6 +133,8 @@ def plot_top_ten_sports_or_events(y_data:str="all", sport:bool=True) -> px.bar:
             total: Showing the total number of medals for the ten sports/events with most medals.
     sport : bool
         If sport (default) should be shown (if False, event will be shown).
+    years : tuple
+        Only count the medals from the first to the last year (default all years).
 
     Returns
     -------
@@ -119,8 +142,11 @@ def plot_top_ten_sports_or_events(y_data:str="all", sport:bool=True) -> px.bar:
         A bar graph figure with sport or event on the x-axis and number of medals on the y-axis.
     """
 
-    #Imports the data
-    sport_data, event_data = load_data.import_top_ten_sports_and_events_all_medal_types()
+    #Imports the data (the top ten of a year window come from the prefix sums of the medals, see load_data)
+    if years is None:
+        sport_data, event_data = aggregates.load_aggregate("top_ten_sports_and_events_all_medal_types")
+    else:
+        sport_data, event_data = load_data.import_top_ten_sports_and_events_all_medal_types(years=years)
     sport_total, sport_gold, sport_silver, sport_bronze = sport_data
     event_total, event_gold, event_silver, event_bronze = event_data
 
@@ -153,6 +179,7 @@ def plot_top_ten_sports_or_events(y_data:str="all", sport:bool=True) -> px.bar:
         title = f"Top Ten {x_data}s for USA in the Olympic Games"
     else:    
         title = f"{x_data}s with the Most {y_data} Medals for USA in the Olympic Games"
+    title = years_in_title(title, years)
 
     #Settings for y_data and bar_colors
     colors_dict = dict(Bronze="#CD7F32", Silver="#C0C0C0", Gold="#FFD700")
@@ -188,7 +215,8 @@ def plot_top_ten_sports_or_events(y_data:str="all", sport:bool=True) -> px.bar:
     return fig
 
 
-def plot_participants(data_to_show:str="All", log_scaled:bool=True):
+@timed
+def plot_participants(data_to_show:str="All", log_scaled:bool=True, years:tuple=None):
     """
     Creates a plotly line graph, showing the number of US participants in the Olympic Games per year.
 
@@ -198,6 +226,8 @@ def plot_participants(data_to_show:str="All", log_scaled:bool=True):
         The season to be shown, i.e. All, Summer or Winter (default All).
     log_scaled : bool
         If the medals should be shown log-scaled or not (default True).
+    years : tuple
+        The first and last year to be shown (default all years).
 
     Returns
     -------
@@ -206,7 +236,9 @@ def plot_participants(data_to_show:str="All", log_scaled:bool=True):
     """
 
     #Import the data, create datasets for summer and winter and set the initial y_data
-    participants_data = load_data.import_participants_data()
+    participants_data = aggregates.load_aggregate("participants_data")
+    if years is not None:
+        participants_data = participants_data[participants_data["Year"].between(*years)]
     participants_summer = participants_data[participants_data["Season"] == "Summer"]
     participants_winter = participants_data[participants_data["Season"] == "Winter"]
     y_data = ["Total Number of Participants", "Participants from USA"]
@@ -232,6 +264,7 @@ def plot_participants(data_to_show:str="All", log_scaled:bool=True):
         title = "American Participants in the Olympic Games in Percentage"
     else:
         title = f"Participants from the USA and the World in the {data_to_show} Olympic Games"
+    title = years_in_title(title, years)
 
     #Sets the y-label
     if log_scaled == True and data_to_show != "Percentage":
@@ -307,7 +340,8 @@ def plot_participants(data_to_show:str="All", log_scaled:bool=True):
     return fig
 
 
-def plot_gender_distribution(season="all"):
+@timed
+def plot_gender_distribution(season="all", years=None):
     """
     Creates a plotly line graph, showing the gender distribution for US and the world.
 
@@ -315,6 +349,8 @@ def plot_gender_distribution(season="all"):
     ----------
     season : str
         The season to be shown, i.e. all, summer or winter (default all).
+    years : tuple
+        The first and last year to be shown (default all years).
 
     Returns
     -------
@@ -323,7 +359,9 @@ def plot_gender_distribution(season="all"):
     """
     
     #Import the data
-    participants_data = load_data.import_participants_data()
+    participants_data = aggregates.load_aggregate("participants_data")
+    if years is not None:
+        participants_data = participants_data[participants_data["Year"].between(*years)]
 
     #Sets the title and overwrites the participants_data for summer and winter
     if season == "all":
@@ -334,6 +372,7 @@ def plot_gender_distribution(season="all"):
     elif season == "winter":
         participants_data = participants_data[participants_data["Season"] == "Winter"]
         title = "Gender Distribution among Participants from USA and the World at the Winter Olympic Games"
+    title = years_in_title(title, years)
 
     #Creates the plot
     fig = px.line(participants_data, 
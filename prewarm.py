@@ -0,0 +1,84 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import load_data
+import aggregates
+import callbacks
+import dashboard_states
+from figure_cache import figure_store
+
+# Renders every dashboard state (see dashboard_states.py) into the persistent figure store (figure_cache.figure_store),
+# so that even the first request after a deploy is served from the store.
+# The figures are rendered in a process pool, figures that are already stored for the current dataset are not rendered again.
+# Usage: python prewarm.py [--workers 4]
+
+
+def render_sports(states: list) -> int:
+    """Renders the sports tab figures for a list of (sport, statistic, gender, sports-years). Returns: the number of figures"""
+
+    filtered_sports = getattr(callbacks.filtered_sports, "__wrapped__", callbacks.filtered_sports)
+    update_sports_graph = getattr(callbacks.update_sports_graph, "__wrapped__", callbacks.update_sports_graph)
+    for sport, statistic, gender, years in states:
+        update_sports_graph(filtered_sports(sport, statistic, gender, years), statistic, sport, gender, years)
+
+    return len(states)
+
+
+def render_usa(states: list) -> int:
+    """Renders the USA tab figures for a list of (usa-dropdown, second-dropdown, radio-settings, my-toggle-switch, usa-years). Returns: the number of figures"""
+
+    update_graph = getattr(callbacks.update_graph, "__wrapped__", callbacks.update_graph)
+    for state in states:
+        update_graph(*state)
+
+    return len(states)
+
+
+def prewarm(workers: int = None) -> dict:
+    """
+    Renders every dashboard state into the figure store.
+
+    Parameters
+    ----------
+    workers : int
+        Number of processes (default the number of CPUs, 1 renders in this process).
+
+    Returns
+    -------
+    stats : dict
+        figures (number of states) and seconds.
+    """
+
+    if figure_store.directory is None:
+        raise RuntimeError("The figure store is turned off (FIGURE_STORE_DIR is empty)")
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    # loaded before the pool is started, so the forked processes share the data instead of loading it again
+    load_data.get_sport_statistics()
+    for name in aggregates.AGGREGATES:
+        aggregates.load_aggregate(name)
+
+    # one task per state, the pool hands them out to the processes as they become free
+    tasks = [(render_sports, [state]) for state in dashboard_states.sports_states()]
+    tasks += [(render_usa, [state]) for state in dashboard_states.usa_states()]
+
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            figures = sum(future.result() for future in [pool.submit(function, states) for function, states in tasks])
+    else:
+        figures = sum(function(states) for function, states in tasks)
+
+    return dict(figures=figures, seconds=time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Renders every dashboard figure into the persistent figure store.")
+    parser.add_argument("--workers", type=int, help="number of processes (default the number of CPUs)")
+    args = parser.parse_args()
+
+    stats = prewarm(args.workers)
+    print(f"{stats['figures']} figures in {figure_store.directory} ({stats['seconds']:.1f} s)")
@@ -0,0 +1,108 @@
+import contextlib
+import functools
+import hashlib
+import os
+import threading
+import metrics
+
+# Single-flight calls: concurrent calls with the same key are coalesced into one computation.
+# The first call computes the result, the calls that come in while it runs wait for it and get the same result
+# (or the same exception), so many users opening the dashboard at once compute the first figures only once per worker.
+# Across the workers of a server, file_lock takes a lock file per key in SINGLE_FLIGHT_LOCK_DIR (off when not set):
+# the worker holding it computes, the others wait for it and then find the result in the shared store (see figure_cache.py).
+
+SINGLE_FLIGHT_LOCK_DIR = os.environ.get("SINGLE_FLIGHT_LOCK_DIR") or None
+
+
+class _Call:
+    """A computation in flight, the callers that wait for it share its result."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key."""
+
+    def __init__(self) -> None:
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.computed = 0
+        self.coalesced = 0
+
+    def do(self, key, compute):
+        """Returns: compute(), or the result of the call with the same key that is already running"""
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.computed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            # the next call with this key computes again (the result is not cached here)
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        """Returns: hits (calls that got the result of another call), misses (calls that computed) and calls in flight"""
+        with self._lock:
+            return dict(hits=self.coalesced, misses=self.computed, in_flight=len(self._calls))
+
+
+# the calls in flight in this process
+flights = SingleFlight()
+metrics.register_cache("single_flight", flights.stats)
+
+
+def single_flight(function):
+    """Decorator that coalesces concurrent calls of function with the same (hashable) arguments."""
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        key = (function.__module__, function.__qualname__, args, tuple(sorted(kwargs.items())))
+        return flights.do(key, lambda: function(*args, **kwargs))
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def file_lock(key, lock_dir: str = None):
+    """
+    Context manager that holds an exclusive lock file for key while the block runs, so only one process computes it.
+    Does nothing when there is no lock directory (the lock_dir argument or SINGLE_FLIGHT_LOCK_DIR).
+    """
+
+    lock_dir = lock_dir or SINGLE_FLIGHT_LOCK_DIR
+    if lock_dir is None:
+        yield
+        return
+
+    import fcntl
+
+    os.makedirs(lock_dir, exist_ok=True)
+    path = os.path.join(lock_dir, f"{hashlib.sha256(repr(key).encode()).hexdigest()}.lock")
+    with open(path, "a") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
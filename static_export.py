@@ -0,0 +1,154 @@
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+from typing import Iterable, Optional
+
+# Static export of the dashboard.
+# Every figure the callbacks can return (see dashboard_states.py) is rendered once and written as a json file,
+# named by the hash of its content, together with a manifest that maps each callback state to its file.
+# With STATIC_EXPORT_DIR set to an export the app runs in static mode: the figure callbacks read the exported files
+# instead of computing anything.
+# Usage: python static_export.py [--output-dir Data/static]
+
+DEFAULT_EXPORT_DIR = "Data/static"
+
+# the export the app serves from, None when the app computes the figures
+STATIC_EXPORT_DIR = os.environ.get("STATIC_EXPORT_DIR") or None
+
+_manifest = None
+
+
+def static_mode() -> bool:
+    """Returns: True if the app serves the figures from a static export"""
+    return STATIC_EXPORT_DIR is not None
+
+
+def manifest() -> dict:
+    """Returns: the manifest of the static export (read once)"""
+    global _manifest
+
+    if _manifest is None:
+        with open(os.path.join(STATIC_EXPORT_DIR, "manifest.json")) as file:
+            _manifest = json.load(file)
+
+    return _manifest
+
+
+def state_key(function_name: str, state: tuple) -> str:
+    """Returns: the manifest key for a callback and its inputs"""
+    return "|".join([function_name] + [json.dumps(value) for value in state])
+
+
+def static_figure(function=None, *, ignore: Iterable[str] = ()):
+    """
+    Decorator for the figure callbacks: in static mode the figure is read from the export instead of calling the function.
+
+    Parameters
+    ----------
+    ignore : Iterable[str]
+        Names of arguments that are not part of the state (for example data that is derived from the other arguments).
+    """
+
+    if function is None:
+        return functools.partial(static_figure, ignore=ignore)
+
+    signature = inspect.signature(function)
+    ignore = set(ignore)
+
+    def state(*args, **kwargs) -> tuple:
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        return tuple(value for name, value in arguments.arguments.items() if name not in ignore)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not static_mode():
+            return function(*args, **kwargs)
+
+        return read_figure(state_key(function.__name__, state(*args, **kwargs)))
+
+    wrapper.state = state
+    return wrapper
+
+
+def read_figure(key: str) -> Optional[dict]:
+    """Returns: the exported figure for a manifest key (None if the state was not exported)"""
+
+    file_name = manifest()["figures"].get(key)
+    if file_name is None:
+        return None
+
+    with open(os.path.join(STATIC_EXPORT_DIR, file_name)) as file:
+        return json.load(file)
+
+
+def export(output_dir: str = DEFAULT_EXPORT_DIR) -> dict:
+    """
+    Renders every dashboard state and writes the figures and a manifest.
+
+    Parameters
+    ----------
+    output_dir : str
+        The directory to write the export to (default Data/static).
+
+    Returns
+    -------
+    manifest : dict
+        dataset_sha256, created, sports (for the sports dropdown), years (for the year sliders) and figures (manifest key -> file).
+    """
+
+    # imported here, callbacks imports this module for the static_figure decorator
+    import load_data
+    import aggregates
+    import callbacks
+    import dashboard_states
+
+    if static_mode():
+        raise RuntimeError("Unset STATIC_EXPORT_DIR to export, in static mode the figures are read from an export")
+
+    figures_dir = os.path.join(output_dir, "figures")
+    os.makedirs(figures_dir, exist_ok=True)
+
+    # the Dash callbacks without the Dash wrapper
+    filtered_sports = callbacks.filtered_sports.__wrapped__
+    update_sports_graph = callbacks.update_sports_graph.__wrapped__
+    update_graph = callbacks.update_graph.__wrapped__
+
+    calls = [(update_sports_graph, (filtered_sports(sport, statistic, gender, years), statistic, sport, gender, years))
+            for sport, statistic, gender, years in dashboard_states.sports_states()]
+    calls += [(update_graph, state) for state in dashboard_states.usa_states()]
+
+    figures = {}
+    for function, args in calls:
+        figure_json = json.dumps(function(*args), separators=(",", ":")).encode()
+        file_name = f"figures/{hashlib.sha256(figure_json).hexdigest()[:16]}.json"
+        path = os.path.join(output_dir, file_name)
+        if not os.path.exists(path):
+            with open(path, "wb") as file:
+                file.write(figure_json)
+        figures[state_key(function.__name__, function.state(*args))] = file_name
+
+    export_manifest = dict(dataset_sha256=load_data.dataset_version(),
+                            created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                            sports=aggregates.sports(),
+                            years=aggregates.years(),
+                            figures=figures)
+    # the manifest is written last, so an export without a manifest is never served
+    with open(os.path.join(output_dir, "manifest.json"), "w") as file:
+        json.dump(export_manifest, file, indent=2)
+
+    return export_manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Renders every dashboard figure to json files for the static mode (STATIC_EXPORT_DIR).")
+    parser.add_argument("--output-dir", default=DEFAULT_EXPORT_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    export_manifest = export(args.output_dir)
+    print(f"{len(export_manifest['figures'])} figures written to {args.output_dir} ({time.perf_counter() - start:.1f} s)")
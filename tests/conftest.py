@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the app is imported from the repository root and reads its data files relative to it
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
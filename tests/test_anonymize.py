@@ -0,0 +1,47 @@
+import os
+import pandas as pd
+import pytest
+import generate_dataset
+from anonymize_os_data import anonymize
+
+KEY = bytes(32)
+
+
+@pytest.fixture
+def datasets(tmp_path):
+    """Returns: (first, full) csv files, first only has the rows of the older half of the Games"""
+    full = str(tmp_path / "athlete_events.csv")
+    generate_dataset.generate_dataset(full, 5_000, seed=0)
+
+    data = pd.read_csv(full)
+    games = sorted(data["Games"].unique())
+    first = str(tmp_path / "athlete_events_first.csv")
+    data[data["Games"].isin(games[:len(games) // 2])].to_csv(first, index=False)
+
+    return first, full
+
+
+def run(input_path, tmp_path):
+    return anonymize(input_path, str(tmp_path / "anonymized.csv"), chunk_rows=1_000, workers=1, report=None,
+                        incremental=True, store_path=str(tmp_path / "names.sqlite"), key=KEY)
+
+
+def test_incremental_run_only_appends_new_games(datasets, tmp_path):
+    first, full = datasets
+    first_stats = run(first, tmp_path)
+    stats = run(full, tmp_path)
+
+    assert stats["skipped"] == first_stats["rows"]
+    assert len(pd.read_csv(tmp_path / "anonymized.csv")) == len(pd.read_csv(full))
+
+
+def test_incremental_run_without_output_writes_every_row(datasets, tmp_path):
+    first, full = datasets
+    run(first, tmp_path)
+    os.remove(tmp_path / "anonymized.csv")
+    stats = run(full, tmp_path)
+
+    rows = len(pd.read_csv(full))
+    assert stats["skipped"] == 0
+    assert stats["rows"] == rows
+    assert len(pd.read_csv(tmp_path / "anonymized.csv")) == rows
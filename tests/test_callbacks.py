@@ -0,0 +1,63 @@
+import pytest
+
+# Only the graphs (and the tab content) need a round trip to the server,
+# the callbacks that update the controls run in the browser (see the clientside callbacks in callbacks.py).
+
+SERVER_CALLBACKS = {"render_content", "filtered_sports", "update_sports_graph", "update_graph"}
+
+CLIENTSIDE_OUTPUTS = ["sport-statistics.options", "sport-statistics.value", "third-box.style", "gender-selection.value",
+                        "second-dropdown.options", "second-dropdown.value", "radio-settings.options", "radio-settings.value",
+                        "my-toggle-switch.value", "my-toggle-switch.label", "my-toggle-switch.disabled"]
+
+
+@pytest.fixture(scope="module")
+def app():
+    import index
+
+    return index.app
+
+
+def server_callbacks(app) -> dict:
+    """Returns: name -> callback_map entry of every callback that runs on the server"""
+    return {entry["callback"].__name__: entry for entry in app.callback_map.values() if "callback" in entry}
+
+
+def clientside_outputs(app) -> list:
+    """Returns: the outputs (component.property) of the clientside callbacks"""
+    outputs = []
+    for callback in app._callback_list:
+        if callback.get("clientside_function"):
+            outputs.extend(output for output in callback["output"].strip(".").split("...") if output)
+
+    return outputs
+
+
+def round_trips(app, component_id: str) -> list:
+    """Returns: the server callbacks a change of the component's value starts directly"""
+    return sorted(name for name, entry in server_callbacks(app).items()
+                    if any(dependency["id"] == component_id for dependency in entry["inputs"]))
+
+
+def test_only_the_graphs_run_on_the_server(app):
+    assert set(server_callbacks(app)) == SERVER_CALLBACKS
+
+
+def test_controls_are_updated_in_the_browser(app):
+    assert sorted(clientside_outputs(app)) == sorted(CLIENTSIDE_OUTPUTS)
+
+
+@pytest.mark.parametrize("component_id", ["usa-dropdown", "second-dropdown", "radio-settings", "my-toggle-switch", "usa-years"])
+def test_usa_controls_need_one_round_trip(app, component_id):
+    assert round_trips(app, component_id) == ["update_graph"]
+
+
+@pytest.mark.parametrize("component_id", ["sports-dropdown", "sport-statistics", "gender-selection", "sports-years"])
+def test_sports_controls_need_the_data_and_the_graph(app, component_id):
+    assert round_trips(app, component_id) == ["filtered_sports", "update_sports_graph"]
+
+
+@pytest.mark.parametrize("std", [0.0, float("nan")])
+def test_no_normal_curve_without_spread(app, std):
+    import callbacks
+
+    assert callbacks.normal_curve(dict(min=20.0, max=20.0, mean=20.0, std=std)) == dict(x=[], y=[])
@@ -0,0 +1,31 @@
+import os
+import pandas as pd
+import pytest
+import load_data
+from figure_cache import FigureStore
+
+OLD_VERSION = "a" * 64
+NEW_VERSION = "b" * 64
+
+
+@pytest.fixture
+def dataset_version():
+    """Returns: a function that switches the shared dataset to an (empty) dataset with the given version"""
+    yield lambda version: load_data.set_world_data(pd.DataFrame(), version)
+    load_data.clear_world_data_cache()
+
+
+def test_store_keeps_only_the_current_dataset_version(tmp_path, dataset_version):
+    store = FigureStore(str(tmp_path))
+    # a figure file of the flat layout of earlier releases
+    (tmp_path / f"{'0' * 64}.json").write_bytes(b"{}")
+
+    dataset_version(OLD_VERSION)
+    store.put(("figure", OLD_VERSION), b"old")
+    assert store.get(("figure", OLD_VERSION)) == b"old"
+    assert os.listdir(tmp_path) == [OLD_VERSION[:16]]
+
+    dataset_version(NEW_VERSION)
+    store.put(("figure", NEW_VERSION), b"new")
+    assert store.get(("figure", NEW_VERSION)) == b"new"
+    assert os.listdir(tmp_path) == [NEW_VERSION[:16]]
@@ -0,0 +1,53 @@
+import threading
+import pandas as pd
+import pytest
+import columnar_cache
+import generate_dataset
+import load_data
+from medal_cube import unique_medals
+from noc_to_region import noc_to_regions
+
+# The import functions run on a small synthetic dataset (see generate_dataset.py), so the tests do not need the data file.
+
+
+@pytest.fixture(scope="module")
+def world_data(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("data")
+    path = str(directory / "athlete_events.csv")
+    generate_dataset.generate_dataset(path, 20_000, seed=0)
+
+    data = columnar_cache.read_table(path, cache_dir=str(directory / "cache"), dtypes=load_data.WORLD_DATA_SCHEMA)
+    data["Region"] = pd.Categorical(noc_to_regions(data["NOC"]))
+
+    # the app might still be loading the data file in the background
+    for thread in threading.enumerate():
+        if thread.name == "load-sport-statistics":
+            thread.join()
+
+    load_data.set_world_data(data, "test")
+    yield data
+    load_data.clear_world_data_cache()
+
+
+@pytest.mark.parametrize("function", [load_data.import_medals_count, load_data.import_participants_data])
+def test_unknown_noc_gives_empty_frame(world_data, function):
+    known = function("USA")
+    unknown = function("XXX")
+
+    assert len(known) > 0
+    assert unknown.empty
+    # the same columns, with the NOC (or its demonym) in the names
+    assert [column.replace("XXX", "USA") for column in unknown.columns] == [column.replace("American", "USA") for column in known.columns]
+
+
+def test_medal_breakdown_counts_like_groupby(world_data):
+    breakdown = load_data.medal_breakdown(["NOC", "Sex"], Year=[2008, 2012, 2016]).set_index(["NOC", "Sex"])
+
+    medals = unique_medals(world_data)
+    medals = medals[medals["Year"].isin([2008, 2012, 2016])]
+    expected = medals.groupby(["NOC", "Sex", "Medal"], observed=True).size().unstack(fill_value=0)
+    expected = expected.reindex(index=breakdown.index, columns=load_data.MEDAL_TYPES, fill_value=0)
+
+    assert len(breakdown) == len(medals.groupby(["NOC", "Sex"], observed=True))
+    assert (breakdown[load_data.MEDAL_TYPES].to_numpy() == expected.to_numpy()).all()
+    assert (breakdown["Total medals"] == breakdown[load_data.MEDAL_TYPES].sum(axis=1)).all()